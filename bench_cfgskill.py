@@ -0,0 +1,22 @@
+import argparse
+import time
+from lua2csv_cfgskill import extract_skill_entries
+from dump_generator import make_cfgskill_dump
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time extract_skill_entries on synthetic dumps of growing size.')
+    parser.add_argument('-sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='Skill counts to benchmark')
+    args = parser.parse_args()
+
+    base = None
+    for count in args.sizes:
+        lua_data = make_cfgskill_dump(count)
+        start = time.perf_counter()
+        skills = extract_skill_entries(lua_data)
+        elapsed = time.perf_counter() - start
+        assert len(skills) == count
+        per_skill = elapsed / count * 1e6
+        if base is None:
+            base = per_skill
+        print(f'{count:>9} skills  {len(lua_data) / 1e6:8.1f} MB  {elapsed:8.2f} s  '
+              f'{per_skill:6.2f} us/skill  x{per_skill / base:.2f} vs smallest')
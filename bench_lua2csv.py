@@ -0,0 +1,156 @@
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from dump_generator import FLAT_HEADER, write_dump
+
+# Converter -> the real base whose dump size counts as 1x (or bytes when there is none)
+REFERENCE_SIZES = {
+    'flat': 'cfgCardData',
+    'nested': 'cfgCfgCardRoleAbilityPool',
+    'halo': 'cfgcfgHalo',
+    'cfgskill': 1_000_000,
+}
+NESTED_BASE = 'cfgCfgCardRoleAbilityPool'
+
+def reference_bytes(converter, lua_dir='lua'):
+    ref = REFERENCE_SIZES[converter]
+    if isinstance(ref, int):
+        return ref
+    return os.path.getsize(os.path.join(lua_dir, f'{ref}.lua.txt'))
+
+def _rss_bytes():
+    """Peak RSS of this process so far."""
+    # VmHWM starts afresh at exec; ru_maxrss on Linux keeps the parent's peak
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def run_converter(converter, input_file, work_dir, use_cache=False, stream=None):
+    """
+    Child process entry point: run one converter on input_file, writing into
+    work_dir. Returns (seconds, rows, peak RSS before, peak RSS after).
+    """
+    import table_cache
+    from lua2csv import NESTED_CONFIGS, process_lua_to_csv, process_nested_array_lua_to_csv
+    from lua2csv_cfgskill import process_cfgskill_lua_to_csv
+    from lua2csv_halo import extract_halo_data
+
+    if not use_cache:
+        table_cache.CACHE_DIR = None
+    output_file = os.path.join(work_dir, f'{converter}.csv')
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if converter == 'flat':
+            header_file = os.path.join(work_dir, 'header.csv')
+            with open(header_file, 'w', encoding='utf-8') as f:
+                f.write(','.join(FLAT_HEADER))
+            rows = process_lua_to_csv(input_file, output_file, header_file, stream=stream)
+        elif converter == 'nested':
+            array_key, parent_fields, child_fields, headers = NESTED_CONFIGS[NESTED_BASE]
+            rows = process_nested_array_lua_to_csv(input_file, output_file, headers, array_key, parent_fields, child_fields, stream=stream)
+        elif converter == 'halo':
+            rows = extract_halo_data(input_file, output_file)
+        else:
+            rows = process_cfgskill_lua_to_csv(input_file, output_file, os.path.join('format', 'cfgskill.csv'))
+    elapsed = time.perf_counter() - start
+    return elapsed, rows, rss_before, _rss_bytes()
+
+def bench(converters, scales, repeat=1, use_cache=False, stream=None):
+    """
+    Time each converter on synthetic dumps of each scale (times its real
+    dump's size). Each run is in a fresh process, so peak RSS is that
+    converter's alone; the best of repeat runs is kept. stream is passed on
+    to the flat and nested converters as their sort memory budget.
+    """
+    results = []
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(prefix='lua2csv-bench-') as tmp:
+        for converter in converters:
+            for scale in scales:
+                size = int(reference_bytes(converter) * scale)
+                input_file = os.path.join(tmp, f'{converter}.lua.txt')
+                entries = write_dump(input_file, converter, size)
+                size = os.path.getsize(input_file)
+                best = None
+                for _ in range(repeat):
+                    work_dir = os.path.join(tmp, 'out')
+                    os.makedirs(work_dir, exist_ok=True)
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                        run = pool.submit(run_converter, converter, input_file, work_dir, use_cache, stream).result()
+                    shutil.rmtree(work_dir)
+                    if best is None or run[0] < best[0]:
+                        best = run
+                elapsed, rows, rss_before, rss_after = best
+                result = {
+                    'converter': converter,
+                    'scale': scale,
+                    'bytes': size,
+                    'entries': entries,
+                    'rows': rows,
+                    'seconds': round(elapsed, 4),
+                    'mb_per_s': round(size / 1e6 / elapsed, 2),
+                    'peak_rss_mb': round(rss_after / 1e6, 1),
+                    'base_rss_mb': round(rss_before / 1e6, 1),
+                }
+                results.append(result)
+                print(f'{converter:>8} x{scale:<4g} {size / 1e6:8.1f} MB  {elapsed:8.2f} s  '
+                      f'{result["mb_per_s"]:7.2f} MB/s  peak RSS {result["peak_rss_mb"]:7.1f} MB')
+                os.remove(input_file)
+    return results
+
+def compare(results, previous):
+    """Print each result's time and peak RSS against the same converter and scale in previous."""
+    old = {(r['converter'], r['scale']): r for r in previous['results']}
+    for r in results:
+        o = old.get((r['converter'], r['scale']))
+        if o:
+            print(f'{r["converter"]:>8} x{r["scale"]:<4g} time x{r["seconds"] / o["seconds"]:.2f}  '
+                  f'peak RSS x{r["peak_rss_mb"] / o["peak_rss_mb"]:.2f}  vs {previous["date"]}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the converters on synthetic dumps at multiples of the current file sizes.')
+    parser.add_argument('-converters', nargs='+', choices=list(REFERENCE_SIZES), default=list(REFERENCE_SIZES), help='Converters to time (default: all)')
+    parser.add_argument('-scales', type=float, nargs='+', default=[1, 10, 100], help='Dump sizes as multiples of the real ones (default 1 10 100)')
+    parser.add_argument('-repeat', type=int, default=1, help='Runs per size; the fastest is kept (default 1)')
+    parser.add_argument('-cache', action='store_true', help='Leave the decoded-table cache on (by default every run decodes from scratch)')
+    parser.add_argument('-stream', type=float, metavar='MB', help='Run flat and nested conversions in streaming mode with this sort memory budget')
+    parser.add_argument('-out', type=str, help='Results file (default output/bench-YYYYMMDD-HHMMSS.json)')
+    parser.add_argument('-compare', type=str, metavar='JSON', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    now = datetime.datetime.now()
+    results = bench(args.converters, args.scales, args.repeat, args.cache, None if args.stream is None else int(args.stream * (1 << 20)))
+    doc = {
+        'date': now.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'stream_mb': args.stream,
+        'results': results,
+    }
+    out = args.out or os.path.join('output', f'bench-{now.strftime("%Y%m%d-%H%M%S")}.json')
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(doc, f, indent=1)
+    print(f'Wrote {out}.')
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f))
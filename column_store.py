@@ -0,0 +1,284 @@
+import argparse
+import gc
+import marshal
+import os
+import sys
+import time
+import tracemalloc
+from array import array
+
+# numpy is optional: numpy() hands out views of the column buffers when it is installed
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Column kinds, chosen per field from the values every row has:
+#   'int', 'float', 'bool' - one array slot per row
+#   'str'                  - codes into a table of the distinct strings
+#   'int_list', 'str_list' - lists as offsets into one flat array of items
+#                            (ints, or codes of distinct strings)
+#   'object'               - anything else (maps, nested lists, mixed types),
+#                            as codes into the distinct values kept as
+#                            marshal bytes, decoded again on access
+INT_MIN, INT_MAX = -(1 << 63), (1 << 63) - 1
+
+def _code_type(n):
+    """Smallest array typecode holding 0..n-1."""
+    return 'B' if n <= 1 << 8 else 'H' if n <= 1 << 16 else 'I'
+
+def _is_int(v):
+    return type(v) is int and INT_MIN <= v <= INT_MAX
+
+def _kind(values):
+    types = {type(v) for v in values}
+    if types == {int} and all(INT_MIN <= v <= INT_MAX for v in values):
+        return 'int'
+    if types == {float}:
+        return 'float'
+    if types == {bool}:
+        return 'bool'
+    if types == {str}:
+        return 'str'
+    # An empty Lua table decodes to {}, so list columns allow empty maps too
+    lists = [v for v in values if type(v) is list]
+    if lists and all(type(v) is list or v == {} for v in values):
+        items = [x for v in lists for x in v]
+        if all(_is_int(x) for x in items):
+            return 'int_list'
+        if all(type(x) is str for x in items):
+            return 'str_list'
+    return 'object'
+
+class Column:
+    """
+    One field of a ColumnTable. present is None when every row has the
+    field, else a bytearray of 0/1 per row; absent rows hold a filler slot
+    (0, or an empty list) so positions line up.
+    """
+
+    def __init__(self, values, present=None):
+        rows = [v for v, p in zip(values, present or [1] * len(values)) if p]
+        self.kind = _kind(rows) if rows else 'object'
+        self.present = present
+        kind = self.kind
+        filler = 0 if kind in ('int', 'bool', 'float') else None
+        values = [v if p else filler for v, p in zip(values, present or [1] * len(values))]
+        self.values = None
+        self.empty_maps = None
+        if kind == 'int':
+            self.data = array('q', values)
+        elif kind == 'bool':
+            self.data = array('b', values)
+        elif kind == 'float':
+            self.data = array('d', [v or 0.0 for v in values])
+        elif kind == 'str':
+            self.values, self.data = self._encode(values)
+        elif kind == 'object':
+            self.values, self.data = self._encode([marshal.dumps(v) for v in values])
+        else:
+            self.empty_maps = {i for i, v in enumerate(values) if v == {}} or None
+            lists = [v if type(v) is list else [] for v in values]
+            self.offsets = array('I', [0])
+            total = 0
+            for v in lists:
+                total += len(v)
+                self.offsets.append(total)
+            items = [x for v in lists for x in v]
+            if kind == 'int_list':
+                self.data = array('q', items)
+            else:
+                self.values, self.data = self._encode(items)
+
+    @staticmethod
+    def _encode(values):
+        """(distinct values, codes) of strings or bytes."""
+        distinct = []
+        codes = {}
+        out = []
+        for v in values:
+            code = codes.get(v)
+            if code is None:
+                code = codes[v] = len(distinct)
+                distinct.append(sys.intern(v) if type(v) is str else v)
+            out.append(code)
+        return distinct, array(_code_type(len(distinct)), out)
+
+    def has(self, i):
+        return self.present is None or self.present[i]
+
+    def get(self, i):
+        """The value of row i, or None if the row lacks the field."""
+        if not self.has(i):
+            return None
+        kind = self.kind
+        if kind in ('int', 'float'):
+            return self.data[i]
+        if kind == 'bool':
+            return bool(self.data[i])
+        if kind == 'str':
+            return self.values[self.data[i]]
+        if kind == 'object':
+            return marshal.loads(self.values[self.data[i]])
+        if self.empty_maps is not None and i in self.empty_maps:
+            return {}
+        items = self.data[self.offsets[i]:self.offsets[i + 1]]
+        if kind == 'int_list':
+            return items.tolist()
+        return [self.values[c] for c in items]
+
+    def nbytes(self):
+        """Bytes held by the column: its buffers plus the distinct values (measured one level deep)."""
+        total = self.data.buffer_info()[1] * self.data.itemsize
+        if self.present is not None:
+            total += len(self.present)
+        if self.kind in ('int_list', 'str_list'):
+            total += self.offsets.buffer_info()[1] * self.offsets.itemsize
+        if self.values is not None:
+            total += sys.getsizeof(self.values) + sum(sys.getsizeof(s) for s in self.values)
+        return total
+
+class ColumnTable:
+    """
+    A decoded table (as read_table returns it) stored by column: each field
+    once as a Column, field names interned, strings and other repeated
+    values stored once per column and referenced by small integer codes.
+
+        store = ColumnTable(table_cache.read_table('lua/cfgCardData.lua.txt'))
+        store.get(10190)['name']       # one entry as a dict
+        store.column('name')           # every row's value
+        store.to_table() == table      # the original shape
+
+    Rows come back as new dicts with keys in field order, so changing one
+    leaves the store as it was. Keyed tables also keep their keys as a
+    column.
+    """
+
+    def __init__(self, table):
+        self.is_list = isinstance(table, list)
+        if self.is_list:
+            keys = list(range(1, len(table) + 1))
+            entries = table
+        else:
+            keys = list(table)
+            entries = list(table.values())
+        self.keys = Column(keys)
+        # Non-dict entries (rare: a table of plain values) go through a column of their own
+        self._plain = None
+        if not all(isinstance(e, dict) for e in entries):
+            self._plain = Column([e if not isinstance(e, dict) else None for e in entries],
+                                 bytearray(0 if isinstance(e, dict) else 1 for e in entries))
+        self.fields = list(dict.fromkeys(sys.intern(k) if isinstance(k, str) else k
+                                         for e in entries if isinstance(e, dict) for k in e))
+        self.columns = {}
+        missing = object()
+        for field in self.fields:
+            values = [e.get(field, missing) if isinstance(e, dict) else missing for e in entries]
+            present = None
+            if any(v is missing for v in values):
+                present = bytearray(v is not missing for v in values)
+            self.columns[field] = Column(values, present)
+        self._len = len(entries)
+        self._index = None
+
+    def __len__(self):
+        return self._len
+
+    def row(self, i):
+        """Row i (0-based) as a dict."""
+        if self._plain is not None and self._plain.has(i):
+            return self._plain.get(i)
+        return {f: c.get(i) for f, c in self.columns.items() if c.has(i)}
+
+    def rows(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def items(self):
+        for i in range(len(self)):
+            yield self.keys.get(i), self.row(i)
+
+    def index(self, key):
+        """Row number of key, or None."""
+        if self._index is None:
+            self._index = {self.keys.get(i): i for i in range(len(self))}
+        return self._index.get(key)
+
+    def get(self, key, default=None):
+        """The entry stored under key as a dict (1-based positions for list tables)."""
+        i = self.index(key)
+        return default if i is None else self.row(i)
+
+    def column(self, field):
+        """Every row's value of field, None where a row lacks it."""
+        col = self.columns[field]
+        if col.kind in ('int', 'float') and col.present is None:
+            return col.data.tolist()
+        return [col.get(i) for i in range(len(self))]
+
+    def numpy(self, field):
+        """A read-only NumPy view of an int, float or bool column (needs numpy)."""
+        if np is None:
+            raise Exception('ColumnTable.numpy needs numpy: pip install numpy')
+        col = self.columns[field]
+        dtypes = {'int': np.int64, 'float': np.float64, 'bool': np.int8}
+        if col.kind not in dtypes:
+            raise Exception(f'Column {field} is {col.kind}, not numeric')
+        view = np.frombuffer(col.data, dtype=dtypes[col.kind])
+        return view.astype(bool) if col.kind == 'bool' else view
+
+    def to_table(self):
+        """The table in read_table's shape: a list for positional tables, else a dict."""
+        if self.is_list:
+            return list(self.rows())
+        return dict(self.items())
+
+    def nbytes(self):
+        return self.keys.nbytes() + sum(c.nbytes() for c in self.columns.values()) + (self._plain.nbytes() if self._plain else 0)
+
+def bench(input_file):
+    """
+    Memory of a table as dicts of dicts (read_table's output, loaded from the
+    table cache) against the same table as a ColumnTable once the dicts are
+    dropped, plus the time to build the store and to read every row back.
+    Checks the round trip.
+    """
+    import table_cache
+    expected = table_cache.read_table(input_file)  # fills the table cache, untraced
+    tracemalloc.start()
+    try:
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        table = table_cache.read_table(input_file)
+        gc.collect()
+        dict_bytes = tracemalloc.get_traced_memory()[0] - before
+        started = time.perf_counter()
+        store = ColumnTable(table)
+        build = time.perf_counter() - started
+        del table
+        gc.collect()
+        store_bytes = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    started = time.perf_counter()
+    back = store.to_table()
+    rows = time.perf_counter() - started
+    if back != expected:
+        raise Exception(f'{input_file}: ColumnTable does not round-trip')
+    return {'dict_bytes': dict_bytes, 'store_bytes': store_bytes, 'build': build, 'rows': rows, 'entries': len(store)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Memory of decoded tables as dicts of dicts against the column store.')
+    parser.add_argument('-file', type=str, nargs='+', help='Bases to measure (default every lua/*.lua.txt)')
+    args = parser.parse_args()
+
+    bases = args.file or sorted(name[:-len('.lua.txt')] for name in os.listdir('lua') if name.endswith('.lua.txt'))
+    total_dict = total_store = 0
+    print(f'{"base":<28} {"entries":>7} {"dicts":>10} {"columns":>10} {"ratio":>6} {"build":>7} {"rows":>7}')
+    for base in bases:
+        r = bench(os.path.join('lua', f'{base}.lua.txt'))
+        total_dict += r['dict_bytes']
+        total_store += r['store_bytes']
+        print(f'{base:<28} {r["entries"]:>7} {r["dict_bytes"] / 1024:>8.0f}KB {r["store_bytes"] / 1024:>8.0f}KB '
+              f'{r["dict_bytes"] / max(r["store_bytes"], 1):>5.1f}x {r["build"] * 1000:>5.0f}ms {r["rows"] * 1000:>5.0f}ms')
+    print(f'{"total":<28} {"":>7} {total_dict / 1024:>8.0f}KB {total_store / 1024:>8.0f}KB {total_dict / max(total_store, 1):>5.1f}x')
@@ -0,0 +1,108 @@
+import argparse
+import random
+
+# Converter shape -> table name written as _G["X"]
+DUMP_NAMES = {'flat': 'CfgSynthetic', 'nested': 'CfgSyntheticPool', 'halo': 'cfgHalo', 'cfgskill': 'skill'}
+# Header of the synthetic flat dumps; the benchmark writes it to format/
+FLAT_HEADER = ['id', 'key', 'name', 'quality', 'icon', 'desc', 'desc4', 'ids', 'arr', 'attack', 'percent', 'bIsPassive']
+
+_WORDS = ['攻撃力', '防御力', '耐久値', '会心率', '味方全体', '敵単体', 'ターン', '継続', '確率', 'ダメージ', '回復', 'シールド']
+_PUNCT = ['：', '，', '、', '。', '（', '）', '【', '】', '「', '」', '％', '…', '　']
+
+def _text(rng, words):
+    """Japanese-looking text with full-width punctuation, <color> and <skillEff> markup."""
+    parts = []
+    for _ in range(words):
+        r = rng.random()
+        if r < 0.15:
+            parts.append(f'<color=#FFC432>{rng.randint(1, 300)}%</color>')
+        elif r < 0.25:
+            parts.append(f'<skillEff={rng.choice(_WORDS)}>')
+        else:
+            parts.append(rng.choice(_WORDS))
+        parts.append(rng.choice(_PUNCT))
+    return ''.join(parts)
+
+def _long_string(rng, words):
+    # Multi-line [[...]] string as in the real dumps' long descriptions
+    return '[[' + '\n'.join(_text(rng, max(1, words // 3)) for _ in range(3)) + ']]'
+
+def flat_entry(rng, n):
+    entry_id = 100000 + n
+    ids = ','.join(str(rng.randint(1000, 999999)) for _ in range(rng.randint(0, 6)))
+    arr = ','.join(f'{{["id"]={rng.randint(1, 9999)},["num"]={rng.randint(1, 99)}}}' for _ in range(rng.randint(0, 3)))
+    return (f'[{entry_id}]={{["id"]={entry_id},["key"]="{entry_id}",["name"]="{_text(rng, 2)}",'
+            f'["quality"]={rng.randint(1, 6)},["icon"]="icon_{n % 500}",["desc"]="{_text(rng, 8)}",'
+            f'["desc4"]={_long_string(rng, 12)},["ids"]={{{ids}}}\n,["arr"]={{{arr}}}\n,'
+            f'["attack"]={rng.randint(50, 500)},["percent"]={rng.randint(1, 99) / 100},'
+            f'["bIsPassive"]={"true" if rng.random() < 0.3 else "false"}}}\n')
+
+def nested_entry(rng, n):
+    # Shaped like cfgCfgCardRoleAbilityPool: an arr of {index, remarks, desc}
+    items = ','.join(f'{{["index"]={i},["remarks"]="{_text(rng, 2)}",["desc"]={_long_string(rng, 6)}}}'
+                     for i in range(1, rng.randint(2, 8)))
+    return f'[{n + 1}]={{["id"]={n + 1},["icon"]="pool_{n % 50}",["arr"]={{{items}}}\n}}\n'
+
+def halo_entry(rng, n):
+    coords = ','.join(f'{{{rng.randint(1, 3)},{rng.randint(1, 3)}}}\n' for _ in range(rng.randint(2, 6)))
+    halo = ','.join(f'{{{rng.randint(-2, 1)},{rng.randint(-2, 1)}}}\n' for _ in range(rng.randint(1, 5)))
+    stats = rng.sample(['attack', 'defense', 'maxhp', 'speed'], rng.randint(1, 2))
+    percents = ','.join(f'["{s}"]={rng.randint(1, 20) / 100}' for s in stats)
+    return (f'[{10000 + n}]={{["nClass"]={{0}}\n,["coordinate"]={{{coords}}}\n,["coorHalo"]={{{halo}}}\n,'
+            f'["id"]={10000 + n},["percents"]={{{percents}}}\n,["key"]="{n}",["name"]="{_text(rng, 1)}",'
+            f'["use_types"]={{1,{rng.randint(2, 3)}}}\n}}\n')
+
+def cfgskill_entry(rng, n):
+    skill_id = 8501 + n
+    return (f'[{skill_id}]={{["id"]={skill_id},["key"]="{skill_id}",["icon_bg_type"]=5,'
+            f'["range_key"]="one",["np"]={n % 50},["sp"]={n % 7},'
+            f'["bIsPassive"]={"true" if rng.random() < 0.3 else "false"},'
+            f'["name"]="{_text(rng, 1)}",["desc"]={_long_string(rng, 6)},'
+            f'["aEffects"]={{{{["type"]=1,["val"]={{1,{rng.randint(1, 9)}}}}},{{["type"]=2,["val"]={{}}}}}}}}\n')
+
+ENTRY_MAKERS = {'flat': flat_entry, 'nested': nested_entry, 'halo': halo_entry, 'cfgskill': cfgskill_entry}
+
+def _make(kind, seed, more):
+    """
+    A synthetic _G["X"]={...} dump of the given shape, with entries added
+    while more(entries so far, UTF-8 bytes so far) holds. Returns (text,
+    entry count); the same seed always gives the same dump.
+    """
+    rng = random.Random(seed)
+    make_entry = ENTRY_MAKERS[kind]
+    parts = [f'_G["{DUMP_NAMES[kind]}"]={{']
+    size = len(parts[0])
+    n = 0
+    while more(n, size):
+        part = (',' if n else '') + make_entry(rng, n)
+        parts.append(part)
+        size += len(part.encode('utf-8'))
+        n += 1
+    parts.append('}')
+    return ''.join(parts), n
+
+def make_dump(kind, target_bytes, seed=0):
+    """A dump of the given shape grown entry by entry until it is at least target_bytes; (text, entry count)."""
+    return _make(kind, seed, lambda n, size: size < target_bytes)
+
+def make_cfgskill_dump(count, seed=0):
+    """The text of a cfgskill dump of exactly count entries, generated as make_dump('cfgskill', ...) does."""
+    return _make('cfgskill', seed, lambda n, size: n < count)[0]
+
+def write_dump(path, kind, target_bytes, seed=0):
+    """Write make_dump's text to path; returns the entry count."""
+    text, count = make_dump(kind, target_bytes, seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    return count
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic Lua dump for benchmarking.')
+    parser.add_argument('kind', choices=list(ENTRY_MAKERS), help='Shape of the dump: the converter it is meant for')
+    parser.add_argument('output', help='File to write, e.g. /tmp/bench/lua/cfgSynthetic.lua.txt')
+    parser.add_argument('-mb', type=float, default=1, help='Size of the dump in MB (default 1)')
+    parser.add_argument('-seed', type=int, default=0, help='Random seed (default 0)')
+    args = parser.parse_args()
+
+    count = write_dump(args.output, args.kind, int(args.mb * 1e6), args.seed)
+    print(f'Wrote {count} entries to {args.output}.')
@@ -0,0 +1,110 @@
+import argparse
+import glob
+import json
+import marshal
+import mmap
+import os
+from lua_decoder import iter_lua_fields, decode_lua_value
+
+LUA_DIR = 'lua'
+# Bump when the index layout changes
+INDEX_VERSION = 1
+
+def index_path(input_file):
+    return input_file + '.idx'
+
+def _stat_key(input_file):
+    st = os.stat(input_file)
+    return (INDEX_VERSION, st.st_size, st.st_mtime_ns)
+
+def build_index(input_file):
+    """
+    Record the byte offset and length of every top-level entry of input_file
+    and store them in {input_file}.idx. Returns {key: (offset, length)}.
+    """
+    with open(input_file, 'rb') as f:
+        data = f.read()
+    text = data.decode('utf-8')
+    start = text.find('=')
+    if start == -1:
+        raise Exception('Could not find = in file')
+
+    # Character offsets from the scanner are turned into byte offsets by
+    # encoding only the text between consecutive entries
+    offsets = {}
+    char_pos = 0
+    byte_pos = 0
+    for key, value_start, value_end in iter_lua_fields(text, start):
+        byte_pos += len(text[char_pos:value_start].encode('utf-8'))
+        length = len(text[value_start:value_end].encode('utf-8'))
+        # Later duplicate keys replace earlier ones, as in decode_lua_table
+        offsets[key] = (byte_pos, length)
+        byte_pos += length
+        char_pos = value_end
+
+    tmp = f'{index_path(input_file)}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        marshal.dump((_stat_key(input_file), offsets), f)
+    os.replace(tmp, index_path(input_file))
+    return offsets
+
+def load_index(input_file):
+    """The entry index of input_file, rebuilt if missing or older than the file."""
+    try:
+        with open(index_path(input_file), 'rb') as f:
+            stat_key, offsets = marshal.load(f)
+        if stat_key == _stat_key(input_file):
+            return offsets
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    return build_index(input_file)
+
+def _lookup(offsets, entry_id):
+    if entry_id in offsets:
+        return offsets[entry_id]
+    # Accept '703300303' for 703300303 and the reverse
+    if isinstance(entry_id, str) and entry_id.lstrip('-').isdigit():
+        return offsets.get(int(entry_id))
+    if isinstance(entry_id, int):
+        return offsets.get(str(entry_id))
+    return None
+
+def get_entries(base, ids, translate=None, lua_dir=LUA_DIR):
+    """
+    Decode only the requested top-level entries of lua/{base}.lua.txt.
+
+    Returns {id: entry} for the ids present in the file; missing ids are
+    left out. The file is read through mmap, so only the pages holding the
+    requested entries are touched.
+    """
+    input_file = os.path.join(lua_dir, f'{base}.lua.txt')
+    offsets = load_index(input_file)
+    result = {}
+    with open(input_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for entry_id in ids:
+            span = _lookup(offsets, entry_id)
+            if span is None:
+                continue
+            offset, length = span
+            # Same newline handling as reading the file in text mode
+            text = mm[offset:offset + length].decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+            result[entry_id], _ = decode_lua_value(text, 0, translate)
+    return result
+
+def get_entry(base, entry_id, translate=None, lua_dir=LUA_DIR):
+    """A single top-level entry, e.g. get_entry('cfgCfgSkillDesc', 703300303); None if absent."""
+    return get_entries(base, [entry_id], translate, lua_dir).get(entry_id)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fetch single entries from lua/{base}.lua.txt by id without decoding the whole file.')
+    parser.add_argument('base', nargs='?', help='Base name, e.g. cfgCfgSkillDesc')
+    parser.add_argument('ids', nargs='*', help='Top-level ids to print as JSON')
+    parser.add_argument('-build', action='store_true', help='(Re)build the .idx file of every lua/*.lua.txt')
+    args = parser.parse_args()
+
+    if args.build:
+        for input_file in sorted(glob.glob(os.path.join(LUA_DIR, '*.lua.txt'))):
+            print(f'Indexed {len(build_index(input_file))} entries of {input_file}.')
+    if args.base:
+        entries = get_entries(args.base, args.ids)
+        print(json.dumps(entries, ensure_ascii=False, indent=1))
@@ -0,0 +1,150 @@
+import os
+from collections.abc import Mapping
+import profiler
+from external_sort import ExternalSorter
+from output_sink import write_outputs, DEFAULT_FORMATS
+
+# Child tables exploded out of a base's entries in the same decode that builds
+# its main table, each written to output/{base}_{table}.csv in every format.
+# Each value: a list of (table, parent_fields, path, columns)
+#   parent_fields - entry keys copied to the front of every row, e.g. ['id']
+#   path          - keys walked from the entry down to the row values; '*' steps
+#                   into every item of a list (or value of a map), so
+#                   ['changeCardIds', '*', '*'] gives a row per id of each group
+#   columns       - (header, selector) for the rest of the row. selector is a
+#                   key of the row value, a 1-based position in it if it is a
+#                   list, or None for the value itself; '#' is the list position
+#                   (or map key) taken at the last '*', and '#1', '#2', ... those
+#                   at the first, second, ... '*'
+EXPLODE_CONFIGS = {
+    'cfgCardData': [
+        ('skills',         ['id'], ['skills', '*'],            [('idx', '#'), ('skill_id', None)]),
+        ('pos_enum',       ['id'], ['pos_enum', '*'],          [('idx', '#'), ('pos', None)]),
+        ('skin',           ['id'], ['skin', '*'],              [('idx', '#'), ('skin_id', None)]),
+        ('skinMinBreakLv', ['id'], ['skinMinBreakLv', '*'],    [('skin_id', '#'), ('break_lv', None)]),
+        ('changeCardIds',  ['id'], ['changeCardIds', '*', '*'], [('group', '#1'), ('idx', '#2'), ('card_id', None)]),
+    ],
+    'cfgcfgHalo': [
+        ('coordinate', ['id'], ['coordinate', '*'], [('idx', '#'), ('x', 1), ('y', 2)]),
+        ('coorHalo',   ['id'], ['coorHalo', '*'],   [('idx', '#'), ('dx', 1), ('dy', 2)]),
+        ('percents',   ['id'], ['percents', '*'],   [('effect', '#'), ('percent', None)]),
+    ],
+}
+
+def child_output_file(output_file, table):
+    """output/cfgCardData.csv -> output/cfgCardData_skills.csv"""
+    root, ext = os.path.splitext(output_file)
+    return f'{root}_{table}{ext}'
+
+def child_columns(children):
+    """Top-level entry keys the children read, for the decoder's projection."""
+    columns = set()
+    for _, parent_fields, path, _ in children:
+        columns.update(parent_fields)
+        columns.add(path[0])
+    return columns
+
+def iter_path(value, path, positions=()):
+    """(positions taken at each '*', value) for every value path leads to from value."""
+    for i, step in enumerate(path):
+        if step == '*':
+            if isinstance(value, Mapping):
+                items = value.items()
+            elif isinstance(value, list):
+                items = enumerate(value, 1)
+            else:
+                return
+            rest = path[i + 1:]
+            for pos, item in items:
+                yield from iter_path(item, rest, positions + (pos,))
+            return
+        if not isinstance(value, Mapping) or step not in value:
+            return
+        value = value[step]
+    yield positions, value
+
+def _select(value, positions, selector):
+    if selector is None:
+        return value
+    if isinstance(selector, str) and selector.startswith('#'):
+        return positions[int(selector[1:]) - 1 if selector[1:] else -1]
+    if isinstance(value, Mapping):
+        return value.get(selector)
+    if isinstance(value, list) and isinstance(selector, int) and 0 < selector <= len(value):
+        return value[selector - 1]
+    return None
+
+def iter_child_rows(entries, parent_fields, path, columns):
+    """Rows of one child table, as decoded values, in entry order."""
+    for entry in entries:
+        if not isinstance(entry, Mapping):
+            continue
+        parent_vals = [entry.get(f) for f in parent_fields]
+        for positions, value in iter_path(entry, path):
+            yield parent_vals + [_select(value, positions, selector) for _, selector in columns]
+
+class ChildTables:
+    """
+    The child tables of a base, filled from the entries its main table is
+    built from, so both come out of one decode:
+
+        children = ChildTables(EXPLODE_CONFIGS['cfgCardData'], flatten_value, flat_sort_key)
+        rows = flat_rows(children.iter_observed(entries), header)
+        children.write('output/cfgCardData.csv')
+
+    Values go through format_value (if given) and each table's rows are
+    sorted by sort_key (if given, else kept in entry order). With memory set,
+    rows are sorted with ExternalSorter under that budget per table.
+    """
+
+    def __init__(self, children, format_value=None, sort_key=None, memory=None):
+        self.children = children
+        self.format_value = format_value
+        self.sort_key = sort_key
+        self.memory = memory
+        if memory is not None:
+            self.rows = [ExternalSorter(sort_key or (lambda row: 0), memory) for _ in children]
+        else:
+            self.rows = [[] for _ in children]
+
+    def columns(self):
+        return child_columns(self.children)
+
+    def observe(self, entry):
+        fmt = self.format_value
+        for (_, parent_fields, path, columns), rows in zip(self.children, self.rows):
+            add = rows.add if self.memory is not None else rows.append
+            for row in iter_child_rows((entry,), parent_fields, path, columns):
+                add([fmt(v) for v in row] if fmt else row)
+
+    def observe_all(self, entries):
+        for entry in entries:
+            self.observe(entry)
+
+    def iter_observed(self, entries):
+        """Pass entries through unchanged, observing each on the way."""
+        for entry in entries:
+            self.observe(entry)
+            yield entry
+
+    def tables(self):
+        """(table, header, rows) for each child table in turn, rows sorted and profiled as sort:{table}."""
+        for (table, parent_fields, _, columns), rows in zip(self.children, self.rows):
+            with profiler.stage(f'sort:{table}'):
+                if self.memory is not None:
+                    rows = rows.sorted()
+                elif self.sort_key is not None:
+                    rows.sort(key=self.sort_key)
+            yield table, list(parent_fields) + [name for name, _ in columns], rows
+
+    def write(self, output_file, formats=DEFAULT_FORMATS):
+        """
+        Write each table next to output_file; returns the total row count.
+        Each table is profiled as its own sort:{table} and write:{table} stages.
+        """
+        total = 0
+        for table, header, rows in self.tables():
+            count, paths = write_outputs(child_output_file(output_file, table), header, rows, formats, f'write:{table}')
+            print(f'Wrote {count} rows to {" and ".join(paths)}.')
+            total += count
+        return total
@@ -0,0 +1,93 @@
+import heapq
+import marshal
+import tempfile
+
+# Default memory budget for rows held before a sorted run is spilled to disk
+SORT_MEMORY = 64 << 20
+# Rough per-row and per-cell overhead of a list of str, on top of the text
+_ROW_OVERHEAD = 72
+_CELL_OVERHEAD = 56
+
+def _row_size(row):
+    return _ROW_OVERHEAD + sum(_CELL_OVERHEAD + len(cell) for cell in row)
+
+def _spill(rows, tmp_dir):
+    f = tempfile.TemporaryFile(dir=tmp_dir)
+    dump = marshal.dump
+    for row in rows:
+        dump(row, f)
+    f.seek(0)
+    return f
+
+def _read_run(f):
+    load = marshal.load
+    while True:
+        try:
+            yield load(f)
+        except EOFError:
+            return
+
+def _merge(runs, tail, key):
+    try:
+        yield from heapq.merge(*(_read_run(f) for f in runs), tail, key=key)
+    finally:
+        for f in runs:
+            f.close()
+
+class ExternalSorter:
+    """
+    external_sort for rows that arrive one at a time: add() each row, then
+    sorted() once for the iterator over all of them in key order. Several
+    sorters can be filled from the same pass over a table.
+    """
+
+    def __init__(self, key, memory=SORT_MEMORY, tmp_dir=None):
+        self.key = key
+        self.memory = memory
+        self.tmp_dir = tmp_dir
+        self.runs = []
+        self.chunk = []
+        self.size = 0
+
+    def add(self, row):
+        self.chunk.append(row)
+        self.size += _row_size(row)
+        if self.size >= self.memory:
+            self.chunk.sort(key=self.key)
+            self.runs.append(_spill(self.chunk, self.tmp_dir))
+            self.chunk = []
+            self.size = 0
+
+    def close(self):
+        """Drop the spilled runs without reading them."""
+        for f in self.runs:
+            f.close()
+        self.runs = []
+
+    def sorted(self):
+        chunk, runs = self.chunk, self.runs
+        self.chunk, self.runs = [], []
+        chunk.sort(key=self.key)
+        if not runs:
+            return iter(chunk)
+        return _merge(runs, chunk, self.key)
+
+def external_sort(rows, key, memory=SORT_MEMORY, tmp_dir=None):
+    """
+    Sort an iterable of rows (lists of str) by key, like sorted(rows, key=key)
+    but holding at most about memory bytes of rows at a time.
+
+    Rows are gathered until their estimated size reaches memory, then that
+    run is sorted and spilled to an anonymous temp file. The input is consumed
+    before this returns; the result is an iterator that lazily merges the
+    runs. Runs are merged in input order, so the sort is stable and the output
+    is exactly that of sorted().
+    """
+    sorter = ExternalSorter(key, memory, tmp_dir)
+    try:
+        for row in rows:
+            sorter.add(row)
+    except BaseException:
+        sorter.close()
+        raise
+    return sorter.sorted()
@@ -1,29 +1,25 @@
-import re
-from slpp import slpp as lua
+import argparse
+import os
+import schema
+import table_cache
+from manifest import file_hash
 
-with open('lua/cfgskill.lua.txt', 'r', encoding='utf-8') as f:
-    lua_data = f.read()
+def entry_keys(base, lua_dir='lua', format_dir=schema.FORMAT_DIR, cache_dir=None):
+    """The keys of every entry of {lua_dir}/{base}.lua.txt, in first-seen order."""
+    input_file = os.path.join(lua_dir, f'{base}.lua.txt')
 
-start = lua_data.find('=')
-start = lua_data.find('{', start)
-end = lua_data.rfind('}')
-lua_table = lua_data[start:end+1]
+    # A schema written by lua2csv.py -schema for this exact dump already lists the keys
+    saved = schema.load_schema(base, format_dir)
+    if saved is not None and saved.get('lua_sha256') == file_hash(input_file):
+        return list(saved['fields'])
+    table_data = table_cache.read_table(input_file, cache_dir=cache_dir)
+    collector = schema.SchemaCollector()
+    collector.observe_all(table_data.values() if isinstance(table_data, dict) else table_data)
+    return collector.header()
 
-# Clean up
-lua_table = re.sub(r'--.*', '', lua_table)
-lua_table = re.sub(r'\n', '', lua_table)
-lua_table = re.sub(r',([}\]])', r'\1', lua_table)
-lua_table = re.sub(r'([\[{])([0-9]+)=', r'\1"\2":', lua_table)
-lua_table = re.sub(r'([\[{])([a-zA-Z_][a-zA-Z0-9_]*)=', r'\1"\2":', lua_table)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print the keys of every entry of a base, in first-seen order.')
+    parser.add_argument('base', nargs='?', default='cfgskill', help='Base name (default cfgskill)')
+    args = parser.parse_args()
 
-table_data = lua.decode(lua_table)
-
-keys = []
-seen = set()
-for entry in table_data.values():
-    for key in entry.keys():
-        if key not in seen:
-            seen.add(key)
-            keys.append(key)
-
-print(','.join(keys))
\ No newline at end of file
+    print(','.join(entry_keys(args.base)))
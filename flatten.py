@@ -0,0 +1,31 @@
+import json
+from collections.abc import Mapping, Sequence
+import markup
+
+# How decoded values become output cells, shared by every converter
+
+def clean_string(s):
+    # Markup rendered as markup.MODE says (by default colour tags dropped)
+    return markup.render(s)
+
+def flatten_value(val):
+    if isinstance(val, bool):
+        return 'true' if val else 'false'
+    elif isinstance(val, str):
+        # Quotes are left to each output format's own escaping
+        return clean_string(val)
+    elif isinstance(val, Mapping):
+        return json.dumps(val, ensure_ascii=False)
+    elif isinstance(val, Sequence) and not isinstance(val, str):
+        return ';'.join([flatten_value(v) for v in val])
+    elif val is None:
+        return ''
+    else:
+        return str(val)
+
+def flat_sort_key(row):
+    # Sort rows by id (first column)
+    return int(row[0]) if row[0].isdigit() else 0
+
+def nested_sort_key(row):
+    return int(row[0]) if row[0].lstrip('-').isdigit() else 0
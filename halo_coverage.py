@@ -0,0 +1,170 @@
+import argparse
+import os
+import time
+import table_cache
+
+# numpy is only needed for this module; the converters never import it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HALO_FILE = os.path.join('lua', 'cfgcfgHalo.lua.txt')
+CARD_FILE = os.path.join('lua', 'cfgCardData.lua.txt')
+# Formation grid (rows, cols); positions are 1-based (row, col) as in the dumps
+GRID = (3, 3)
+# Halo use_types are the ids of the stats in percents: 1 attack, 2 maxhp, ...
+STATS = ['attack', 'maxhp', 'defense', 'speed', 'crit_rate', 'crit', 'hit', 'resist']
+
+class HaloCoverage:
+    """
+    Every halo as arrays, for scoring formations in bulk.
+
+    halo_ids       (H,)                 halo ids, in dump order
+    offsets        (H, K, 2)            coorHalo (row, col) offsets from the
+                                        card's own cell, padded with zeros
+    offset_mask    (H, K)               which offsets are real
+    coverage       (H, cells, cells)    coverage[h, a, t]: halo h on a card at
+                                        cell a buffs cell t (off-grid cells dropped)
+    bonus          (H, stats)           percents, columns in stats order
+    card_ids       (C,)                 cards with at least one halo
+    card_buffs     (C, cells, cells, stats)
+                                        summed coverage * bonus of each card's
+                                        halos, so a formation is one gather and sum
+
+    Cells are numbered (row - 1) * cols + (col - 1).
+    """
+
+    def __init__(self, halos, cards, grid=GRID):
+        if np is None:
+            raise Exception('halo_coverage needs numpy: pip install numpy')
+        self.grid = grid
+        rows, cols = grid
+        cells = rows * cols
+        halos = [h for h in halos if isinstance(h, dict) and 'id' in h]
+        stats = STATS + sorted({k for h in halos for k in h.get('percents', {})} - set(STATS))
+        self.stats = stats
+
+        self.halo_ids = np.array([h['id'] for h in halos], dtype=np.int64)
+        width = max((len(h.get('coorHalo', [])) for h in halos), default=0)
+        self.offsets = np.zeros((len(halos), width, 2), dtype=np.int64)
+        self.offset_mask = np.zeros((len(halos), width), dtype=bool)
+        self.bonus = np.zeros((len(halos), len(stats)), dtype=np.float64)
+        for i, h in enumerate(halos):
+            offsets = h.get('coorHalo', [])
+            if offsets:
+                self.offsets[i, :len(offsets)] = offsets
+                self.offset_mask[i, :len(offsets)] = True
+            for k, v in h.get('percents', {}).items():
+                self.bonus[i, stats.index(k)] = v
+
+        # Every (halo, anchor cell, offset) at once; off-grid targets are dropped
+        anchors = np.stack(np.divmod(np.arange(cells), cols), axis=1)
+        targets = anchors[None, :, None, :] + self.offsets[:, None, :, :]
+        inside = ((targets >= 0) & (targets < grid)).all(axis=-1) & self.offset_mask[:, None, :]
+        h_idx, a_idx, k_idx = np.nonzero(inside)
+        t_idx = targets[h_idx, a_idx, k_idx, 0] * cols + targets[h_idx, a_idx, k_idx, 1]
+        self.coverage = np.zeros((len(halos), cells, cells), dtype=bool)
+        self.coverage[h_idx, a_idx, t_idx] = True
+
+        halo_index = {int(h): i for i, h in enumerate(self.halo_ids)}
+        cards = [c for c in cards if isinstance(c, dict) and c.get('halo')]
+        self.card_ids = np.array([c['id'] for c in cards], dtype=np.int64)
+        owned = np.zeros((len(cards), len(halos)), dtype=np.float64)
+        for i, c in enumerate(cards):
+            for h in c['halo']:
+                if h not in halo_index:
+                    raise Exception(f'Card {c["id"]} has unknown halo {h}')
+                owned[i, halo_index[h]] += 1
+        self.card_buffs = np.einsum('ch,hat,hs->cats', owned, self.coverage.astype(np.float64), self.bonus)
+        self._card_order = np.argsort(self.card_ids, kind='stable')
+        self._sorted_ids = self.card_ids[self._card_order]
+        # Cards without a halo map to an extra all-zero slot
+        self._padded = np.concatenate([self.card_buffs, np.zeros((1,) + self.card_buffs.shape[1:])])
+
+    def card_index(self, card_ids):
+        """Rows of card_buffs for card_ids (any shape); cards without a halo get the zero row."""
+        ids = np.asarray(card_ids, dtype=np.int64)
+        if not len(self._sorted_ids):
+            return np.zeros(ids.shape, dtype=np.intp)
+        pos = np.minimum(np.searchsorted(self._sorted_ids, ids), len(self._sorted_ids) - 1)
+        return np.where(self._sorted_ids[pos] == ids, self._card_order[pos], len(self.card_ids))
+
+    def cell_index(self, positions):
+        """Cell numbers of 1-based (row, col) positions, shape (..., 2) -> (...)."""
+        pos = np.asarray(positions, dtype=np.int64)
+        rows, cols = self.grid
+        if pos.shape[-1:] != (2,):
+            raise Exception('Positions must be (row, col) pairs')
+        if ((pos < 1) | (pos > self.grid)).any():
+            raise Exception(f'Positions must be within the {rows}x{cols} grid')
+        return (pos[..., 0] - 1) * cols + (pos[..., 1] - 1)
+
+    def _per_cell(self, positions, card_ids):
+        # (cells of each card (F, n), summed buffs (F, cells, stats), single formation?)
+        cells = self.cell_index(positions)
+        single = cells.ndim == 1
+        if single:
+            cells = cells[None]
+        index = np.broadcast_to(self.card_index(card_ids), cells.shape)
+        return cells, self._padded[index, cells].sum(axis=1), single
+
+    def buffs(self, positions, card_ids):
+        """
+        Summed halo buff per cell and stat for a batch of formations.
+
+        positions  (F, n, 2) 1-based (row, col) of each card, or (n, 2) for one formation
+        card_ids   (n,) the same cards for every formation, or (F, n)
+
+        Returns (F, cells, stats), or (cells, stats) for one formation.
+        """
+        _, out, single = self._per_cell(positions, card_ids)
+        return out[0] if single else out
+
+    def unit_buffs(self, positions, card_ids):
+        """Like buffs, but the buff on each card's own cell: (F, n, stats), or (n, stats)."""
+        cells, per_cell, single = self._per_cell(positions, card_ids)
+        out = np.take_along_axis(per_cell, cells[..., None], axis=1)
+        return out[0] if single else out
+
+def load_halo_coverage(halo_file=HALO_FILE, card_file=CARD_FILE, grid=GRID):
+    """HaloCoverage of the halo dump and the halo lists of the card dump (both via table_cache)."""
+    halos = table_cache.read_table(halo_file)
+    cards = table_cache.read_table(card_file, None, {'id', 'halo'})
+    return HaloCoverage(halos.values() if isinstance(halos, dict) else halos,
+                        cards.values() if isinstance(cards, dict) else cards, grid)
+
+def random_formations(count, cards, grid=GRID, seed=0):
+    """count formations of cards on distinct random cells, as (count, cards, 2) positions."""
+    rng = np.random.default_rng(seed)
+    rows, cols = grid
+    cells = np.argsort(rng.random((count, rows * cols)), axis=1)[:, :cards]
+    return np.stack(np.divmod(cells, cols), axis=-1) + 1
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summed halo buffs per grid cell for a formation, e.g. 10190@2,2 30020@1,3.')
+    parser.add_argument('cards', nargs='*', help='card_id@row,col for each card of the formation')
+    parser.add_argument('-bench', type=int, metavar='N', help='Time N random formations of -size cards with halos in one batch')
+    parser.add_argument('-size', type=int, default=5, help='Cards per formation with -bench (default 5)')
+    args = parser.parse_args()
+
+    coverage = load_halo_coverage()
+    if args.cards:
+        ids, positions = [], []
+        for card in args.cards:
+            card_id, pos = card.split('@')
+            ids.append(int(card_id))
+            positions.append([int(p) for p in pos.split(',')])
+        out = coverage.buffs(positions, ids)
+        cols = coverage.grid[1]
+        print('cell   ' + ' '.join(f'{s:>9}' for s in coverage.stats))
+        for cell, row in enumerate(out):
+            print(f'{cell // cols + 1},{cell % cols + 1}    ' + ' '.join(f'{v:9.3g}' for v in row))
+    if args.bench:
+        rng = np.random.default_rng(0)
+        card_ids = coverage.card_ids[rng.integers(len(coverage.card_ids), size=(args.bench, args.size))]
+        positions = random_formations(args.bench, args.size, coverage.grid)
+        start = time.perf_counter()
+        coverage.buffs(positions, card_ids)
+        elapsed = time.perf_counter() - start
+        print(f'{args.bench} formations in {elapsed:.3f}s ({args.bench / elapsed:,.0f} formations/s).')
@@ -0,0 +1,420 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+import table_cache
+from explode import iter_path
+from validate import FOREIGN_KEYS
+from watch import make_watcher
+
+HOST = '127.0.0.1'
+PORT = 8765
+# Largest request line or HTTP body accepted, in bytes
+MAX_REQUEST = 1 << 20
+
+class Snapshot:
+    """
+    One version of a base as loaded: the decoded table and, built on first
+    use, {value: entry} indexes of its fields. A reload replaces the whole
+    Snapshot, so a lookup never sees half of an old version and half of a new.
+    """
+    __slots__ = ('table', 'stat', 'loaded', '_indexes')
+
+    def __init__(self, table, stat):
+        self.table = table
+        self.stat = stat
+        self.loaded = time.time()
+        self._indexes = {}
+
+    def entries(self):
+        items = self.table.items() if isinstance(self.table, dict) else enumerate(self.table, 1)
+        return ((key, entry) for key, entry in items if isinstance(entry, dict))
+
+    def index(self, field):
+        index = self._indexes.get(field)
+        if index is None:
+            index = {}
+            for _, entry in self.entries():
+                value = entry.get(field)
+                if isinstance(value, (int, float, str)):
+                    index.setdefault(value, entry)
+            self._indexes[field] = index
+        return index
+
+    def find(self, value, field='id'):
+        """The entry whose field is value (for id, else the entry stored under key value); '10190' finds 10190."""
+        for v in _id_forms(value):
+            entry = self.index(field).get(v)
+            if entry is None and field == 'id':
+                entry = self.table.get(v) if isinstance(self.table, dict) else None
+            if entry is not None:
+                return entry
+        return None
+
+def _id_forms(value):
+    yield value
+    if isinstance(value, str) and value.lstrip('-').isdigit():
+        yield int(value)
+    elif isinstance(value, int) and not isinstance(value, bool):
+        yield str(value)
+
+def load_snapshot(input_file):
+    st = os.stat(input_file)
+    return Snapshot(table_cache.read_table(input_file), (st.st_size, st.st_mtime_ns))
+
+class TableStore:
+    """
+    Every {base}.lua.txt of lua_dir decoded and held in memory, answering
+    lookups and expanding references along rules (FOREIGN_KEYS by default).
+
+        store = TableStore('lua')
+        store.load_all()
+        store.handle({'base': 'cfgCardData', 'ids': [10190], 'expand': ['skills']})
+    """
+
+    def __init__(self, lua_dir='lua', rules=FOREIGN_KEYS):
+        self.lua_dir = lua_dir
+        self.bases = {}
+        # (base, field) -> [(path, target, key)] for the references expand can follow
+        self.refs = {}
+        for base, path, target, key in rules:
+            self.refs.setdefault((base, path[0]), []).append((path, target, key))
+
+    def input_file(self, base):
+        return os.path.join(self.lua_dir, f'{base}.lua.txt')
+
+    def load_all(self):
+        for name in sorted(os.listdir(self.lua_dir)):
+            if name.endswith('.lua.txt'):
+                base = name[:-len('.lua.txt')]
+                self.bases[base] = load_snapshot(self.input_file(base))
+
+    def changed(self, paths):
+        """Bases among paths whose dump was added, edited or removed since it was loaded."""
+        bases = set()
+        for path in paths:
+            name = os.path.basename(path)
+            if not name.endswith('.lua.txt'):
+                continue
+            base = name[:-len('.lua.txt')]
+            try:
+                st = os.stat(self.input_file(base))
+                stat = (st.st_size, st.st_mtime_ns)
+            except FileNotFoundError:
+                stat = None
+            snap = self.bases.get(base)
+            if stat != (snap.stat if snap else None):
+                bases.add(base)
+        return sorted(bases)
+
+    def handle(self, request):
+        """The response to one request (a dict) or a batch of them (a list)."""
+        if isinstance(request, list):
+            return [self.handle(r) for r in request]
+        try:
+            if not isinstance(request, dict):
+                raise Exception('A request is a JSON object, or a list of them')
+            op = request.get('op', 'get')
+            if op == 'get':
+                return self.get(request)
+            if op == 'bases':
+                return {'bases': {base: {'entries': sum(1 for _ in snap.entries()), 'loaded': snap.loaded}
+                                  for base, snap in sorted(self.bases.items())}}
+            if op == 'ids':
+                snap = self.bases.get(request.get('base'))
+                if snap is None:
+                    raise Exception(f'Unknown base {request.get("base")}')
+                return {'ids': [entry.get('id', key) for key, entry in snap.entries()]}
+            if op == 'ping':
+                return {'ok': True}
+            raise Exception(f'Unknown op {op}')
+        except Exception as e:
+            return {'error': str(e)}
+
+    def get(self, request):
+        """
+        {'base': 'cfgCardData', 'ids': [10190, ...], 'by': 'id',
+         'expand': ['skills', 'halo'] or {'subTfSkills': {'ids': {}}},
+         'fields': ['id', 'name'] or {'cfgCfgSkillDesc': ['id', 'desc']}}
+        -> {'entries': [entry or None per id],
+            'expanded': {target base: {id: entry}}}
+
+        expand follows the references of the named fields to their target
+        entries, and a nested spec goes on from those. fields trims the
+        entries returned (a list applies to base).
+        """
+        base = request.get('base')
+        snap = self.bases.get(base)
+        if snap is None:
+            raise Exception(f'Unknown base {base}')
+        ids = request.get('ids', [])
+        if not isinstance(ids, list):
+            ids = [ids]
+        entries = [snap.find(i, request.get('by', 'id')) for i in ids]
+        expanded = {}
+        spec = request.get('expand') or {}
+        self._expand(base, [e for e in entries if e is not None], spec, expanded)
+
+        fields = request.get('fields')
+        if isinstance(fields, list):
+            fields = {base: fields}
+        fields = fields or {}
+        response = {'entries': [_project(e, fields.get(base)) for e in entries]}
+        if expanded:
+            response['expanded'] = {target: {str(k): _project(e, fields.get(target)) for k, e in found.items()}
+                                    for target, found in expanded.items() if found}
+        return response
+
+    def _expand(self, base, entries, spec, expanded):
+        if isinstance(spec, list):
+            spec = {field: {} for field in spec}
+        for field, sub in spec.items():
+            rules = self.refs.get((base, field))
+            if not rules:
+                raise Exception(f'{base}.{field} is not a known reference')
+            for path, target, key in rules:
+                snap = self.bases.get(target)
+                if snap is None:
+                    continue
+                found = expanded.setdefault(target, {})
+                new = []
+                for entry in entries:
+                    for _, value in iter_path(entry, path):
+                        if not isinstance(value, (int, float, str)) or value in found:
+                            continue
+                        hit = snap.find(value, key)
+                        if hit is not None:
+                            found[value] = hit
+                            new.append(hit)
+                if sub and new:
+                    self._expand(target, new, sub, expanded)
+
+def _project(entry, fields):
+    if entry is None or fields is None:
+        return entry
+    return {f: entry[f] for f in fields if f in entry}
+
+def _encode(response):
+    return json.dumps(response, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _query_request(path):
+    """GET /get?base=cfgCardData&id=10190&expand=skills -> a request dict."""
+    from urllib.parse import urlsplit, parse_qs
+    parts = urlsplit(path)
+    query = parse_qs(parts.query)
+    op = parts.path.strip('/') or 'get'
+    request = {'op': op}
+    if 'base' in query:
+        request['base'] = query['base'][0]
+    if 'id' in query:
+        request['ids'] = [int(i) if i.lstrip('-').isdigit() else i for i in query['id']]
+    for name in ('expand', 'fields'):
+        if name in query:
+            request[name] = [v for vals in query[name] for v in vals.split(',')]
+    if 'by' in query:
+        request['by'] = query['by'][0]
+    return request
+
+class LookupServer:
+    """
+    Serves a TableStore on a Unix socket or localhost TCP port, with two
+    protocols told apart by the first line of a connection:
+      - JSON lines: each line one request (or a list of them), answered by
+        one line
+      - HTTP/1.1: POST / with a JSON body, or GET /get?base=..&id=..&expand=..
+        and GET /bases; keep-alive is honoured
+    The dumps are watched, and a changed base is decoded in a worker thread
+    and then swapped in as a whole.
+    """
+
+    def __init__(self, store, poll=False, debounce=0.5):
+        self.store = store
+        self.poll = poll
+        self.debounce = debounce
+        self.requests = 0
+
+    async def handle_connection(self, reader, writer):
+        try:
+            line = await reader.readline()
+            if line.startswith((b'GET ', b'POST ')):
+                await self._http(line, reader, writer)
+            else:
+                while line:
+                    if line.strip():
+                        writer.write(self._respond(line) + b'\n')
+                        await writer.drain()
+                    line = await reader.readline()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, data):
+        self.requests += 1
+        try:
+            request = json.loads(data)
+        except ValueError as e:
+            return _encode({'error': f'Bad JSON: {e}'})
+        return _encode(self.store.handle(request))
+
+    async def _http(self, line, reader, writer):
+        while line:
+            method, path, version = line.decode('latin-1').split()
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = h.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            if length > MAX_REQUEST:
+                raise ValueError('Request too large')
+            body = await reader.readexactly(length) if length else b''
+            if method == 'POST':
+                payload = self._respond(body)
+            else:
+                self.requests += 1
+                payload = _encode(self.store.handle(_query_request(path)))
+            keep = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json; charset=utf-8\r\n'
+                         + f'Content-Length: {len(payload)}\r\nConnection: {"keep-alive" if keep else "close"}\r\n\r\n'.encode('latin-1')
+                         + payload)
+            await writer.drain()
+            if not keep:
+                return
+            line = await reader.readline()
+
+    async def reload_changed(self):
+        """Reload each base whose dump changes, for as long as the server runs."""
+        loop = asyncio.get_running_loop()
+        watcher = make_watcher([self.store.lua_dir], self.poll)
+        try:
+            while True:
+                # Wait in short slices, so shutting down never waits long on the worker thread
+                paths = await loop.run_in_executor(None, watcher.wait, 1.0)
+                if not paths:
+                    continue
+                while True:
+                    more = await loop.run_in_executor(None, watcher.wait, self.debounce)
+                    if not more:
+                        break
+                    paths |= more
+                for base in self.store.changed(paths):
+                    input_file = self.store.input_file(base)
+                    started = time.perf_counter()
+                    if not os.path.exists(input_file):
+                        self.store.bases.pop(base, None)
+                        print(f'[{base}] dump removed; no longer served.')
+                        continue
+                    try:
+                        snap = await loop.run_in_executor(None, load_snapshot, input_file)
+                    except Exception as e:
+                        # Keep serving the last good version
+                        print(f'[{base}] reload failed, keeping the loaded version: {e}')
+                        continue
+                    self.store.bases[base] = snap
+                    print(f'[{base}] reloaded in {time.perf_counter() - started:.2f}s.')
+        finally:
+            watcher.close()
+
+    async def serve(self, socket_path=None, host=HOST, port=PORT):
+        if socket_path:
+            server = await asyncio.start_unix_server(self.handle_connection, socket_path, limit=MAX_REQUEST)
+            where = socket_path
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_REQUEST)
+            where = f'http://{host}:{port}/'
+        print(f'Serving {len(self.store.bases)} bases on {where}; press Ctrl+C to stop.')
+        reloader = asyncio.create_task(self.reload_changed())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            reloader.cancel()
+
+class LookupClient:
+    """
+    A JSON-lines connection to a running server, for Python callers:
+
+        with LookupClient() as client:
+            client.request({'base': 'cfgCardData', 'ids': [10190], 'expand': ['skills']})
+    """
+
+    def __init__(self, socket_path=None, host=HOST, port=PORT):
+        if socket_path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(socket_path)
+        else:
+            self.sock = socket.create_connection((host, port))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile('rb')
+
+    def request(self, request):
+        self.sock.sendall(_encode(request) + b'\n')
+        return json.loads(self.file.readline())
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def bench(client, count, batch=1):
+    """Time count card -> skills lookups over client, batch requests per round trip; returns lookups per second."""
+    ids = client.request({'op': 'ids', 'base': 'cfgCardData'}).get('ids')
+    if not ids:
+        raise Exception('-bench needs cfgCardData')
+    started = time.perf_counter()
+    sent = 0
+    while sent < count:
+        n = min(batch, count - sent)
+        requests = [{'base': 'cfgCardData', 'ids': [ids[(sent + i) % len(ids)]], 'expand': ['skills'],
+                     'fields': {'cfgCardData': ['id', 'name', 'skills'], 'cfgCfgSkillDesc': ['id', 'name', 'desc']}}
+                    for i in range(n)]
+        client.request(requests if batch > 1 else requests[0])
+        sent += n
+    return count / (time.perf_counter() - started)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='lua2csv.py serve', description='Keep every lua/*.lua.txt decoded in memory and answer lookups over a Unix socket or localhost HTTP, reloading a base when its dump changes.')
+    parser.add_argument('-lua', type=str, default='lua', help='Folder of the {base}.lua.txt dumps (default lua)')
+    parser.add_argument('-socket', type=str, help='Listen on this Unix socket path instead of TCP')
+    parser.add_argument('-host', type=str, default=HOST, help=f'TCP address to listen on (default {HOST})')
+    parser.add_argument('-port', type=int, default=PORT, help=f'TCP port (default {PORT})')
+    parser.add_argument('-poll', action='store_true', help='Poll file sizes and times every second instead of using inotify')
+    parser.add_argument('-debounce', type=float, default=0.5, help='Seconds of quiet after a change before reloading (default 0.5)')
+    parser.add_argument('-bench', type=int, metavar='N', help='Instead of serving, time N card -> skills lookups against a running server')
+    parser.add_argument('-batch', type=int, default=1, help='Lookups per round trip with -bench (default 1)')
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        with LookupClient(args.socket, args.host, args.port) as client:
+            print(f'{bench(client, args.bench, args.batch):,.0f} lookups/s ({args.batch} per round trip).')
+        return 0
+
+    # Keep decoded entries between reloads, so an edited dump only has its changed entries decoded again
+    table_cache.MEMORY = {}
+    started = time.perf_counter()
+    store = TableStore(args.lua)
+    store.load_all()
+    print(f'Loaded {len(store.bases)} bases in {time.perf_counter() - started:.2f}s.')
+    server = LookupServer(store, args.poll, args.debounce)
+    try:
+        asyncio.run(server.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
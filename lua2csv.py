@@ -1,92 +1,36 @@
-﻿import re
-import json
-import csv
-from slpp import slpp as lua
-import string
-from collections.abc import Mapping, Sequence
+﻿import csv
+from lua_decoder import iter_lua_fields, decode_lua_value, stream_lua_table, STRING_TRANSLATE
+from external_sort import external_sort, SORT_MEMORY
+from explode import EXPLODE_CONFIGS, ChildTables, child_columns, child_output_file
+import table_cache
 import argparse
 import datetime
 import os
 import glob
+import io
+import sys
+import contextlib
+import traceback
+import concurrent.futures
+import time
+import manifest
+import markup
+import profiler
+import schema
+from output_sink import write_outputs, output_paths, DEFAULT_FORMATS, FORMAT_EXTENSIONS
+from flatten import clean_string, flatten_value, flat_sort_key, nested_sort_key
+from lua2csv_halo import extract_halo_data
+from lua2csv_cfgskill import process_cfgskill_lua_to_csv
+from watch import make_watcher, wait_for_changes
 
-def clean_string(s):
-    if isinstance(s, str):
-        s = re.sub(r'<color=#[0-9A-Fa-f]{6}>', '', s)
-        s = s.replace('</color>', '')
-        return s
-    return s
-
-def process_lua_to_csv(input_file, output_file, header_file):
-    # Read the header from the CSV file
-    with open(header_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        header = next(reader)
-
-    # Read the Lua table from file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        lua_data = f.read()
-
-    # Extract the table (find the first { after =, and the last })
-    start = lua_data.find('=')
-    if start == -1:
-        raise Exception('Could not find = in file')
-    start = lua_data.find('{', start)
-    end = lua_data.rfind('}')
-    if start == -1 or end == -1:
-        raise Exception('Could not find table braces')
-    lua_table = lua_data[start:end+1]
-
-    # Replace common full-width punctuation with ASCII equivalents
-    fw_map = {
-        '：': ':', '，': ',', '？': '?', '！': '!', '（': '(', '）': ')',
-        '［': '[', '］': ']', '｛': '{', '｝': '}', '“': '"', '”': '"',
-        '‘': "'", '’': "'", '…': '...', '—': '-', '–': '-', '、': ',',
-        '。': '.', '《': '"', '》': '"', '〈': '"', '〉': '"', '·': '.',
-        '「': '"', '」': '"', '『': '"', '』': '"', '【': '[', '】': ']',
-        '％': '%', '＃': '#', '＆': '&', '＊': '*', '／': '/', '＼': '\\',
-        '＂': '"', '＇': "'", '＄': '$', '＠': '@', '＾': '^', '＿': '_',
-        '＋': '+', '＝': '=', '｜': '|', '；': ';', '：': ':', '，': ',',
-        '　': ' ',  # full-width space
-    }
-    for k, v in fw_map.items():
-        lua_table = lua_table.replace(k, v)
-    lua_table = ''.join(c if c in string.printable or ord(c) >= 128 and c not in '\r\n\t' else ' ' for c in lua_table)
-    lua_table = lua_table.replace('true', 'True').replace('false', 'False')
-    lua_table = re.sub(r'\["([a-zA-Z0-9_]+)"\]', r'"\1"', lua_table)  # ["key"] to "key"
-    lua_table = re.sub(r'--.*', '', lua_table)  # Remove comments
-    lua_table = re.sub(r'\n', '', lua_table)  # Remove newlines
-    lua_table = re.sub(r',([}\]])', r'\1', lua_table)  # Remove trailing commas
-    lua_table = re.sub(r'([\[{])([0-9]+)=', r'\1"\2":', lua_table)  # [123]= to "123":
-    lua_table = re.sub(r'([\[{])([a-zA-Z_][a-zA-Z0-9_]*)=', r'\1"\2":', lua_table)  # key= to "key":
-
-    # Convert Lua tables to Python dicts/lists using slpp
-    try:
-        table_data = lua.decode(lua_table)
-    except Exception as e:
-        raise Exception('Failed to parse Lua table with slpp: ' + str(e))
-
-    def flatten_value(val):
-        if isinstance(val, bool):
-            return 'true' if val else 'false'
-        elif isinstance(val, str):
-            val = clean_string(val)
-            return val.replace('"', '""')
-        elif isinstance(val, Mapping):
-            return json.dumps(val, ensure_ascii=False)
-        elif isinstance(val, Sequence) and not isinstance(val, str):
-            return ';'.join(str(flatten_value(v)) for v in val)
-        elif val is None:
-            return ''
-        else:
-            return str(val)
-
-    rows = []
+def table_entries(table_data):
     # table_data may be a dict (mapping) or a list; handle both
     if isinstance(table_data, dict):
-        entries = table_data.values()
-    else:
-        entries = table_data
+        return table_data.values()
+    return table_data
 
+def iter_flat_rows(entries, header):
+    """One row per entry, with the header's columns flattened to strings."""
     for entry in entries:
         # skip non-dict/list entries
         if not isinstance(entry, dict):
@@ -95,26 +39,159 @@ def process_lua_to_csv(input_file, output_file, header_file):
         for col in header:
             v = entry.get(col, '')
             row.append(flatten_value(v))
-        rows.append(row)
+        yield row
 
-    # Sort rows by id (first column)
-    rows.sort(key=lambda x: int(x[0]) if x[0].isdigit() else 0)
+def flat_rows(entries, header):
+    return list(iter_flat_rows(entries, header))
 
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(header)
-        writer.writerows(rows)
+def iter_nested_rows(entries, array_key, parent_fields, child_fields):
+    """One row per item of each entry's array_key list, prefixed with parent_fields."""
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        parent_vals = [clean_string(str(entry.get(f, ''))) for f in parent_fields]
+        arr = entry.get(array_key, [])
+        if isinstance(arr, dict):
+            arr = list(arr.values())
+        for item in arr:
+            if not isinstance(item, dict):
+                continue
+            child_vals = [clean_string(str(item.get(f, ''))) for f in child_fields]
+            yield parent_vals + child_vals
 
-    # Also output a tab-separated .txt file
-    txt_file = output_file.replace('.csv', '.txt')
-    with open(txt_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f, delimiter='\t')
-        writer.writerow(header)
-        writer.writerows(rows)
+def nested_rows(entries, array_key, parent_fields, child_fields):
+    return list(iter_nested_rows(entries, array_key, parent_fields, child_fields))
 
-    print(f'Wrote {len(rows)} rows to {output_file} and {txt_file}.')
+def stream_rows(input_file, memory, columns, row_func, sort_key, *row_args, collector=None, children=None):
+    """
+    Rows of input_file in sorted order, built with bounded memory: entries
+    are decoded one at a time from the file (stream_lua_table), turned into
+    rows by the generator row_func and sorted with external_sort, which
+    spills sorted runs to disk past memory bytes. The result is the
+    same as sorting row_func's rows for the whole decoded table. A
+    SchemaCollector given as collector, and ChildTables given as children,
+    observe each entry on the way.
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        entries = (value for _, value in stream_lua_table(f, STRING_TRANSLATE, columns))
+        if collector is not None:
+            entries = collector.iter_observed(entries)
+        if children is not None:
+            entries = children.iter_observed(entries)
+        return external_sort(row_func(entries, *row_args), sort_key, memory)
+
+# Text of the file each split worker last read, so chunks of the same file
+# handled by one worker process share a single read
+_chunk_text = {}
+
+def _chunk_rows(input_file, spans, columns, mode, row_func, row_args):
+    """Split worker: decode the top-level entries at spans and build their rows, rendering markup in mode."""
+    text = _chunk_text.get(input_file)
+    if text is None:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+        _chunk_text.clear()
+        _chunk_text[input_file] = text
+    entries = [decode_lua_value(text, start, STRING_TRANSLATE, columns)[0] for start, end in spans]
+    with markup.using(mode):
+        return row_func(entries, *row_args)
+
+def split_rows(input_file, workers, columns, row_func, *row_args):
+    """
+    Build rows for input_file with the top-level entries decoded in workers
+    processes. Entry boundaries are found with iter_lua_fields, which skips
+    over entries without decoding them; contiguous runs of entries are
+    decoded per worker and the rows joined back in source order, so the
+    result is exactly what row_func gives on the serially decoded table.
+    Only the keys in columns are decoded from each entry.
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    start = text.find('=')
+    if start == -1:
+        raise Exception('Could not find = in file')
+
+    # Later duplicate keys replace earlier ones in place, as in decode_lua_table
+    spans = {}
+    for key, value_start, value_end in iter_lua_fields(text, start):
+        spans[key] = (value_start, value_end)
+    spans = list(spans.values())
+
+    # About four chunks per worker, balanced by size
+    chunk_size = max(1, (spans[-1][1] - spans[0][0]) // (workers * 4)) if spans else 1
+    chunks = []
+    chunk = []
+    chunk_start = spans[0][0] if spans else 0
+    for span in spans:
+        chunk.append(span)
+        if span[1] - chunk_start >= chunk_size:
+            chunks.append(chunk)
+            chunk = []
+            chunk_start = span[1]
+    if chunk:
+        chunks.append(chunk)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_chunk_rows, input_file, chunk, columns, markup.MODE, row_func, row_args) for chunk in chunks]
+        return [row for f in futures for row in f.result()]
 
-def process_nested_array_lua_to_csv(input_file, output_file, headers, array_key, parent_fields, child_fields):
+def read_header(header_file):
+    # Read the header from the CSV file; an empty file gives []
+    with open(header_file, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        return next(reader, [])
+
+def process_lua_to_csv(input_file, output_file, header_file, workers=1, formats=DEFAULT_FORMATS, children=None, stream=None, collector=None):
+    """
+    Flatten each entry of input_file to a row of the header's columns.
+    children is the base's EXPLODE_CONFIGS list, if any; its child tables are
+    built from the same decode and written next to output_file. stream, a
+    byte budget, converts in streaming mode (see stream_rows). A
+    SchemaCollector given as collector observes every entry, and an empty
+    header is taken from it.
+    """
+    header = read_header(header_file) if collector is None or os.path.exists(header_file) else []
+    if not header and collector is None:
+        raise Exception(f'{header_file} is empty; run with -schema to infer it')
+    # A schema needs every key decoded, not only the header's
+    columns = set(header) if collector is None else None
+    if children:
+        children = ChildTables(children, flatten_value, flat_sort_key, stream if header else None)
+        if columns is not None:
+            columns |= children.columns()
+
+    if stream is not None and header:
+        # Read, decode, flatten and spill sorted runs, one entry at a time
+        with profiler.stage('stream', os.path.getsize(input_file)):
+            rows = stream_rows(input_file, stream, columns, iter_flat_rows, flat_sort_key, header, collector=collector, children=children)
+    else:
+        if workers > 1 and collector is None and not children:
+            # Read, decode and flatten all happen in the workers
+            with profiler.stage('split', os.path.getsize(input_file)):
+                rows = split_rows(input_file, workers, columns, flat_rows, header)
+        else:
+            # Decode only the header's columns, normalising string values as they are read
+            table_data = table_cache.read_table(input_file, STRING_TRANSLATE, columns)
+            entries = table_entries(table_data)
+            with profiler.stage('flatten'):
+                if collector is not None:
+                    # The schema, and an empty header, come from the decoded table
+                    collector.observe_all(entries)
+                    header = header or collector.header()
+                if children:
+                    children.observe_all(entries)
+                rows = flat_rows(entries, header)
+
+        with profiler.stage('sort'):
+            rows.sort(key=flat_sort_key)
+
+    count, paths = write_outputs(output_file, header, rows, formats)
+    print(f'Wrote {count} rows to {" and ".join(paths)}.')
+    if children:
+        children.write(output_file, formats)
+    return count
+
+def process_nested_array_lua_to_csv(input_file, output_file, headers, array_key, parent_fields, child_fields, workers=1, formats=DEFAULT_FORMATS, children=None, stream=None, collector=None):
     """
     Generic flattener for Lua tables whose entries each contain a nested array.
 
@@ -124,121 +201,338 @@ def process_nested_array_lua_to_csv(input_file, output_file, headers, array_key,
     child_fields  - lua keys to pull from each child item (in order), e.g. ['index', 'id']
 
     The combined length of parent_fields + child_fields must equal len(headers).
+    With workers > 1 the entries are decoded in that many processes (see split_rows).
+    children, stream and collector are as for process_lua_to_csv.
     """
-    # Read the Lua table from file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        lua_data = f.read()
+    columns = set(parent_fields) | {array_key} if collector is None else None
+    if children:
+        children = ChildTables(children, flatten_value, nested_sort_key, stream)
+        if columns is not None:
+            columns |= children.columns()
+    if stream is not None:
+        with profiler.stage('stream', os.path.getsize(input_file)):
+            rows = stream_rows(input_file, stream, columns, iter_nested_rows, nested_sort_key, array_key, parent_fields, child_fields, collector=collector, children=children)
+    else:
+        if workers > 1 and collector is None and not children:
+            with profiler.stage('split', os.path.getsize(input_file)):
+                rows = split_rows(input_file, workers, columns, nested_rows, array_key, parent_fields, child_fields)
+        else:
+            # Decode only the fields used, normalising string values as they are read
+            table_data = table_cache.read_table(input_file, STRING_TRANSLATE, columns)
+            entries = table_entries(table_data)
+            with profiler.stage('flatten'):
+                if collector is not None:
+                    collector.observe_all(entries)
+                if children:
+                    children.observe_all(entries)
+                rows = nested_rows(entries, array_key, parent_fields, child_fields)
 
-    # Extract the table (find the first { after =, and the last })
-    start = lua_data.find('=')
-    if start == -1:
-        raise Exception('Could not find = in file')
-    start = lua_data.find('{', start)
-    end = lua_data.rfind('}')
-    if start == -1 or end == -1:
-        raise Exception('Could not find table braces')
-    lua_table = lua_data[start:end+1]
-
-    # Replace common full-width punctuation with ASCII equivalents
-    fw_map = {
-        '：': ':', '，': ',', '？': '?', '！': '!', '（': '(', '）': ')',
-        '［': '[', '］': ']', '｛': '{', '｝': '}', '“': '"', '”': '"',
-        '‘': "'", '’': "'", '…': '...', '—': '-', '–': '-', '、': ',',
-        '。': '.', '《': '"', '》': '"', '〈': '"', '〉': '"', '·': '.',
-        '「': '"', '」': '"', '『': '"', '』': '"', '【': '[', '】': ']',
-        '％': '%', '＃': '#', '＆': '&', '＊': '*', '／': '/', '＼': '\\',
-        '＂': '"', '＇': "'", '＄': '$', '＠': '@', '＾': '^', '＿': '_',
-        '＋': '+', '＝': '=', '｜': '|', '；': ';', '：': ':', '，': ',',
-        '　': ' ',  # full-width space
-    }
-    for k, v in fw_map.items():
-        lua_table = lua_table.replace(k, v)
-    lua_table = ''.join(c if c in string.printable or ord(c) >= 128 and c not in '\r\n\t' else ' ' for c in lua_table)
-    lua_table = lua_table.replace('true', 'True').replace('false', 'False')
-    lua_table = re.sub(r'\["([a-zA-Z0-9_]+)"\]', r'"\1"', lua_table)  # ["key"] to "key"
-    lua_table = re.sub(r'--.*', '', lua_table)  # Remove comments
-    lua_table = re.sub(r'\n', '', lua_table)  # Remove newlines
-    lua_table = re.sub(r',([}\]])', r'\1', lua_table)  # Remove trailing commas
-    lua_table = re.sub(r'([\[{])([0-9]+)=', r'\1"\2":', lua_table)  # [123]= to "123":
-    lua_table = re.sub(r'([\[{])([a-zA-Z_][a-zA-Z0-9_]*)=', r'\1"\2":', lua_table)  # key= to "key":
-
-    # Convert Lua tables to Python dicts/lists using slpp
-    try:
-        table_data = lua.decode(lua_table)
-    except Exception as e:
-        raise Exception('Failed to parse Lua table with slpp: ' + str(e))
+        with profiler.stage('sort'):
+            rows.sort(key=nested_sort_key)
 
-    rows = []
-    for entry in table_data.values():
-        if not isinstance(entry, dict):
-            continue
-        parent_vals = [clean_string(str(entry.get(f, ''))) for f in parent_fields]
-        arr = entry.get(array_key, [])
-        if isinstance(arr, dict):
-            arr = list(arr.values())
-        for item in arr:
-            if not isinstance(item, dict):
-                continue
-            child_vals = [clean_string(str(item.get(f, ''))) for f in child_fields]
-            rows.append(parent_vals + child_vals)
+    count, paths = write_outputs(output_file, headers, rows, formats)
+    print(f'Wrote {count} rows to {" and ".join(paths)}.')
+    if children:
+        children.write(output_file, formats)
+    return count
+
+
+# Bases that use the generic nested-array flattener.
+# Each value: (array_key, parent_fields, child_fields, headers)
+NESTED_CONFIGS = {
+    'cfgCfgSubTalentSkillPool':  ('ids', ['id'],        ['index', 'id'],              ['id', 'index', 'skill_id']),
+    'cfgCfgCardRoleAbilityPool': ('arr', ['id','icon'], ['index', 'remarks', 'desc'], ['id', 'icon','index', 'remarks', 'desc']),
+}
+
+# Bases with their own converter scripts
+SKIP_BASES = {'cfgskill', 'cfgcfgHalo'}
+
+def discover_bases():
+    """Nested bases first, then flat bases discovered from format/*.csv."""
+    # Nested configs don't need a format CSV; add them explicitly
+    nested_bases = list(NESTED_CONFIGS.keys())
+    # Flat configs are discovered from format/*.csv (excluding cfgskill and nested bases)
+    files = sorted(glob.glob(os.path.join('format', '*.csv')))
+    flat_bases = [os.path.splitext(os.path.basename(f))[0] for f in files]
+    flat_bases = [b for b in flat_bases if b not in SKIP_BASES and b not in NESTED_CONFIGS]
+    return nested_bases + flat_bases
+
+def all_bases():
+    """discover_bases plus cfgcfgHalo and cfgskill when their dumps exist."""
+    return discover_bases() + sorted(b for b in SKIP_BASES if os.path.exists(base_paths(b)[0]))
+
+def base_output_file(base, date_str=''):
+    """The .csv output name of a base; other formats swap the extension."""
+    return os.path.join('output', f'{base}{date_str}.csv')
+
+def base_paths(base, date_str='', formats=DEFAULT_FORMATS):
+    """(input_file, header_file, output_files) for a base; header_file is None when no header is read."""
+    input_file = os.path.join('lua', f'{base}.lua.txt')
+    output_file = base_output_file(base, date_str)
+    if base in NESTED_CONFIGS or base == 'cfgcfgHalo':
+        header_file = None
+    else:
+        header_file = os.path.join('format', f'{base}.csv')
+    output_files = output_paths(output_file, formats)
+    for table, _, _, _ in EXPLODE_CONFIGS.get(base, []):
+        output_files += output_paths(child_output_file(output_file, table), formats)
+    return input_file, header_file, output_files
+
+def base_fingerprint(base, mode='color'):
+    """Hashes of a base's inputs, plus the markup mode its outputs are rendered in."""
+    input_file, header_file, _ = base_paths(base)
+    fp = manifest.fingerprint(input_file, header_file, NESTED_CONFIGS.get(base), EXPLODE_CONFIGS.get(base))
+    # Outputs rendered with another -markup mode are stale too
+    if mode != 'color':
+        fp['markup'] = mode
+    return fp
 
-    rows.sort(key=lambda x: int(x[0]) if x[0].lstrip('-').isdigit() else 0)
+# Files smaller than this are decoded serially even with -split
+SPLIT_MIN_BYTES = 1 << 20
 
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(headers)
-        writer.writerows(rows)
+def convert_base(base, date_str='', split=1, formats=DEFAULT_FORMATS, stream=None, mode='color', collector=None):
+    """
+    Convert one base with the converter it needs; returns the number of rows
+    written to its main table. split > 1 decodes large flat and nested bases
+    in that many processes, unless they have EXPLODE_CONFIGS child tables.
+    stream, a byte budget, converts flat and nested bases in streaming mode.
+    Strings are rendered in markup mode. A SchemaCollector given as
+    collector observes every entry (save it with save_base_schema).
+    """
+    input_file, header_file, _ = base_paths(base, date_str, formats)
+    output_file = base_output_file(base, date_str)
+    children = EXPLODE_CONFIGS.get(base)
+    if split > 1 and os.path.getsize(input_file) < SPLIT_MIN_BYTES:
+        split = 1
+    with profiler.base(base), markup.using(mode):
+        if base == 'cfgcfgHalo':
+            rows = extract_halo_data(input_file, output_file, formats, children, collector)
+        elif base == 'cfgskill':
+            rows = process_cfgskill_lua_to_csv(input_file, output_file, header_file, formats, collector)
+        elif base in NESTED_CONFIGS:
+            array_key, parent_fields, child_fields, headers = NESTED_CONFIGS[base]
+            rows = process_nested_array_lua_to_csv(input_file, output_file, headers, array_key, parent_fields, child_fields, split, formats, children, stream, collector)
+        else:
+            rows = process_lua_to_csv(input_file, output_file, header_file, split, formats, children, stream, collector)
+    return rows
+
+def save_base_schema(base, collector):
+    """Write format/{base}.schema.json (and an empty header) from the collector convert_base filled."""
+    input_file, header_file, _ = base_paths(base)
+    schema.save_schema(base, collector, input_file, header_file is not None)
+
+def run_base_job(base, date_str='', split=1, formats=DEFAULT_FORMATS, profile=False, stream=None, mode='color', collect_schema=False):
+    """
+    Process pool entry point: convert one base, capturing its log output.
+
+    Returns {'base', 'rows', 'log', 'error', 'records', 'fingerprint', 'schema'};
+    error is a formatted traceback or None, so one bad base never takes the
+    rest of the run down with it. records holds the base's profiler stages
+    when profile is set, and fingerprint the base_fingerprint of the inputs
+    and markup mode the outputs were converted from, for the manifest. With
+    collect_schema, schema is the base's SchemaCollector, for the caller to
+    save with save_base_schema.
+    """
+    if profile:
+        profiler.enable()
+    log = io.StringIO()
+    rows, error, fp = None, None, None
+    collector = schema.SchemaCollector() if collect_schema else None
+    with contextlib.redirect_stdout(log):
+        try:
+            fp = base_fingerprint(base, mode)
+            rows = convert_base(base, date_str, split, formats, stream, mode, collector)
+        except Exception:
+            error = traceback.format_exc()
+    return {'base': base, 'rows': rows, 'log': log.getvalue(), 'error': error,
+            'records': profiler.take() if profile else [], 'fingerprint': fp,
+            'schema': collector if error is None else None}
+
+def _init_worker(cache_dir):
+    # Workers started with spawn or forkserver do not inherit the parent's globals
+    table_cache.CACHE_DIR = cache_dir
+
+def run_jobs(bases, date_str='', jobs=1, split=1, formats=DEFAULT_FORMATS, profile=False, stream=None, mode='color', collect_schema=False):
+    """
+    Convert bases in a process pool of jobs workers. Results come back in
+    the order of bases, whatever order the workers finish in. Everything a
+    worker needs is passed to it (the cache setting through the pool's
+    initializer), so output is the same under every start method.
+    """
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(table_cache.CACHE_DIR,)) as pool:
+        futures = [pool.submit(run_base_job, base, date_str, split, formats, profile, stream, mode, collect_schema) for base in bases]
+        return [f.result() for f in futures]
 
-    txt_file = output_file.replace('.csv', '.txt')
-    with open(txt_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f, delimiter='\t')
-        writer.writerow(headers)
-        writer.writerows(rows)
+def warm_base(base):
+    """Read the tables convert_base(base) reads, so table_cache.MEMORY holds them."""
+    input_file, header_file, _ = base_paths(base)
+    if base == 'cfgskill' or not os.path.exists(input_file):
+        return
+    if base == 'cfgcfgHalo':
+        table_cache.read_table(input_file)
+    elif base in NESTED_CONFIGS:
+        array_key, parent_fields, _, _ = NESTED_CONFIGS[base]
+        table_cache.read_table(input_file, STRING_TRANSLATE, set(parent_fields) | {array_key} | child_columns(EXPLODE_CONFIGS.get(base, [])))
+    else:
+        table_cache.read_table(input_file, STRING_TRANSLATE, set(read_header(header_file)) | child_columns(EXPLODE_CONFIGS.get(base, [])))
+
+def changed_bases(paths):
+    """Bases whose lua/{base}.lua.txt or format/{base}.csv is among paths."""
+    bases = set()
+    for path in paths:
+        folder, name = os.path.split(path)
+        folder = os.path.basename(folder)
+        if folder == 'lua' and name.endswith('.lua.txt'):
+            bases.add(name[:-len('.lua.txt')])
+        elif folder == 'format' and name.endswith('.csv'):
+            bases.add(name[:-len('.csv')])
+    return sorted(b for b in bases if os.path.exists(base_paths(b)[0]))
 
-    print(f'Wrote {len(rows)} rows to {output_file} and {txt_file}.')
+def watch_bases(state, date_str='', formats=DEFAULT_FORMATS, only=None, poll=False, debounce=0.5, stream=None, mode='color', collect_schema=False):
+    """
+    Reconvert bases whenever their Lua dump or format header changes, until
+    interrupted. Bursts of writes are debounced into one batch, and each
+    affected base is converted in this process so the decoded tables in
+    table_cache.MEMORY stay warm: an edited dump only has its changed entries
+    decoded again. A failing base is reported and watching continues.
+    """
+    watcher = make_watcher(['lua', 'format'], poll)
+    print(f'Watching lua/ and format/ for changes ({type(watcher).__name__}); press Ctrl+C to stop.')
+    try:
+        while True:
+            bases = changed_bases(wait_for_changes(watcher, debounce))
+            for base in bases:
+                if only and base not in only:
+                    continue
+                started = time.perf_counter()
+                result = run_base_job(base, date_str, 1, formats, stream=stream, mode=mode, collect_schema=collect_schema)
+                print(result['log'], end='')
+                if result['error']:
+                    print(f'[{base}] failed:\n{result["error"]}', end='')
+                    continue
+                if result['schema'] is not None:
+                    save_base_schema(base, result['schema'])
+                manifest.record(state, base, result['fingerprint'], base_paths(base, date_str, formats)[2])
+                manifest.save_manifest(state)
+                print(f'[{base}] regenerated in {time.perf_counter() - started:.2f}s.')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
 
 
 if __name__ == '__main__':
+    # lua2csv.py diff old_dir new_dir [...]: version-to-version comparison
+    if sys.argv[1:2] == ['diff']:
+        from lua_diff import main as diff_main
+        sys.exit(diff_main(sys.argv[2:]))
+    # lua2csv.py validate [...]: dangling references between the dumps
+    if sys.argv[1:2] == ['validate']:
+        from validate import main as validate_main
+        sys.exit(validate_main(sys.argv[2:]))
+    # lua2csv.py serve [...]: resident lookup server over the decoded dumps
+    if sys.argv[1:2] == ['serve']:
+        from lookup_server import main as serve_main
+        sys.exit(serve_main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description='Convert Lua table files to CSV.')
     parser.add_argument('-file', type=str, nargs='+', help='Base name(s) of the file(s) to process (e.g., cfgCardData cfgCfgSkillDesc). For each, looks for lua/{file}.lua.txt and format/{file}.csv. Use -date to include YYYYMMDD in output filename.')
     parser.add_argument('-date', action='store_true', help='Include date (YYYYMMDD) in output filename')
+    parser.add_argument('-jobs', type=int, help='Convert all bases (including cfgcfgHalo and cfgskill) in N worker processes; failures are reported per base')
+    parser.add_argument('-split', type=int, default=1, help=f'Decode each file of at least {SPLIT_MIN_BYTES >> 20} MB in N worker processes, split at top-level entries (output is identical to a serial run)')
+    parser.add_argument('-formats', nargs='+', choices=list(FORMAT_EXTENSIONS), default=list(DEFAULT_FORMATS), help='Output formats written in one pass: csv (.csv), tsv (.txt), jsonl (.jsonl). Default: csv tsv')
+    parser.add_argument('-sqlite', '--sqlite', type=str, metavar='DB', help='Instead of CSV, load the bases (all of them, including cfgcfgHalo and cfgskill, unless -file is given) into a SQLite database, e.g. output/cfg.db')
+    parser.add_argument('-no-cache', action='store_true', help=f'Decode every file from scratch instead of using the decoded-table cache in {table_cache.CACHE_DIR}')
+    parser.add_argument('-clear-cache', nargs='?', type=float, const=0, metavar='DAYS', help='Empty the decoded-table cache (or drop entries unused for DAYS days) and exit')
+    parser.add_argument('-force', '--force', action='store_true', help='Convert every base even if its inputs are unchanged since the last run (see output/manifest.json)')
+    parser.add_argument('-profile', '--profile', nargs='?', const='', metavar='JSON', help='Time each stage (read, decode, flatten, sort, write) of each base with its bytes and peak allocation, print a summary table, and write the records to JSON if a path is given')
+    parser.add_argument('-markup', '--markup', choices=markup.MODES, default=markup.MODE, help='Rendering of <color> and <skillEff> tags in strings: color drops colour tags only (default), plain also turns <skillEff=X> into X, tags keeps strings as they are')
+    parser.add_argument('-stream', '--stream', nargs='?', type=float, const=SORT_MEMORY >> 20, metavar='MB', help='Convert flat and nested bases with bounded memory: decode entries one at a time from the file and sort rows with an external merge sort that spills to disk past MB megabytes (default %(const)s). Output is identical; -split is not used')
+    parser.add_argument('-schema', '--schema', action='store_true', help='While converting, infer each base\'s keys, value types, nullability and list/map shapes and write them to format/{base}.schema.json; an empty or missing format/{base}.csv gets the inferred header. Warns when fields were added or dropped since the last schema')
+    parser.add_argument('-watch', '--watch', action='store_true', help='After converting, keep running and reconvert bases (including cfgcfgHalo and cfgskill, or only those given with -file) as lua/ and format/ change. Decoded tables are kept in memory, so edits regenerate quickly; -jobs and -split are not used while watching')
+    parser.add_argument('-poll', action='store_true', help='With -watch, poll file sizes and times every second instead of using inotify')
+    parser.add_argument('-debounce', type=float, default=0.5, help='With -watch, wait this many seconds of quiet after a change before converting (default 0.5)')
     args = parser.parse_args()
 
     # date suffix only when requested
     date_str = f'_{datetime.datetime.now().strftime("%Y%m%d")}' if args.date else ''
 
-    # Bases that use the generic nested-array flattener.
-    # Each value: (array_key, parent_fields, child_fields, headers)
-    NESTED_CONFIGS = {
-        'cfgCfgSubTalentSkillPool':  ('ids', ['id'],        ['index', 'id'],              ['id', 'index', 'skill_id']),
-        'cfgCfgCardRoleAbilityPool': ('arr', ['id','icon'], ['index', 'remarks', 'desc'], ['id', 'icon','index', 'remarks', 'desc']),
-    }
+    if args.clear_cache is not None:
+        removed = table_cache.clear_cache(older_than_days=args.clear_cache or None)
+        print(f'Removed {len(removed)} cached table(s) from {table_cache.CACHE_DIR}.')
+        sys.exit(0)
+    if args.no_cache:
+        table_cache.CACHE_DIR = None
+    if args.watch:
+        table_cache.MEMORY = {}
+    if args.profile is not None:
+        profiler.enable()
+    stream = None if args.stream is None else int(args.stream * (1 << 20))
 
+    if args.sqlite:
+        from sqlite_export import export_sqlite
+        with markup.using(args.markup):
+            errors = export_sqlite(args.sqlite, args.file or all_bases())
+        for base, error in errors.items():
+            print(f'[{base}] failed: {error}')
+        print(f'Wrote {args.sqlite}.')
+        sys.exit(1 if errors else 0)
+
+    # Bases named with -file are always converted; a full run skips unchanged ones.
+    # -jobs and -watch also bring in the halo and cfgskill converters if their dumps exist.
     if args.file:
-        for base in args.file:
-            input_file = os.path.join('lua', f'{base}.lua.txt')
-            output_file = os.path.join('output', f'{base}{date_str}.csv')
-            if base in NESTED_CONFIGS:
-                array_key, parent_fields, child_fields, headers = NESTED_CONFIGS[base]
-                process_nested_array_lua_to_csv(input_file, output_file, headers, array_key, parent_fields, child_fields)
-            else:
-                header_file = os.path.join('format', f'{base}.csv')
-                process_lua_to_csv(input_file, output_file, header_file)
+        bases = args.file
+    elif args.jobs or args.watch:
+        bases = all_bases()
     else:
-        # Nested configs don't need a format CSV; add them explicitly
-        nested_bases = list(NESTED_CONFIGS.keys())
-        # Flat configs are discovered from format/*.csv (excluding cfgskill and nested bases)
-        files = glob.glob(os.path.join('format', '*.csv'))
-        flat_bases = [os.path.splitext(os.path.basename(f))[0] for f in files]
-        SKIP_BASES = {'cfgskill', 'cfgcfgHalo'}
-        flat_bases = [b for b in flat_bases if b not in SKIP_BASES and b not in NESTED_CONFIGS]
-        for base in nested_bases + flat_bases:
-            input_file = os.path.join('lua', f'{base}.lua.txt')
-            output_file = os.path.join('output', f'{base}{date_str}.csv')
-            if base in NESTED_CONFIGS:
-                array_key, parent_fields, child_fields, headers = NESTED_CONFIGS[base]
-                process_nested_array_lua_to_csv(input_file, output_file, headers, array_key, parent_fields, child_fields)
-            else:
-                header_file = os.path.join('format', f'{base}.csv')
-                process_lua_to_csv(input_file, output_file, header_file)
+        bases = discover_bases()
+    check = not args.file and not args.force
+    state = manifest.load_manifest()
+    skipped = []
+    todo = []
+    for base in bases:
+        fp = base_fingerprint(base, args.markup)
+        output_files = base_paths(base, date_str, args.formats)[2]
+        if check and manifest.is_up_to_date(state, base, fp, output_files):
+            skipped.append(base)
+        else:
+            todo.append((base, fp, output_files))
 
+    if args.jobs:
+        results = run_jobs([base for base, _, _ in todo], date_str, args.jobs, args.split, args.formats, args.profile is not None, stream, args.markup, args.schema)
+        failed = []
+        for (base, _, output_files), result in zip(todo, results):
+            print(result['log'], end='')
+            profiler.RECORDS.extend(result['records'])
+            if result['error']:
+                failed.append(base)
+                print(f'[{base}] failed:\n{result["error"]}', end='')
+            else:
+                if result['schema'] is not None:
+                    save_base_schema(base, result['schema'])
+                manifest.record(state, base, result['fingerprint'], output_files)
+        manifest.save_manifest(state)
+        print(f'Converted {len(todo) - len(failed)} base(s), {sum(r["rows"] or 0 for r in results)} rows total.')
+    else:
+        failed = []
+        for base, fp, output_files in todo:
+            collector = schema.SchemaCollector() if args.schema else None
+            convert_base(base, date_str, args.split, args.formats, stream, args.markup, collector)
+            if collector is not None:
+                save_base_schema(base, collector)
+            manifest.record(state, base, fp, output_files)
+            manifest.save_manifest(state)
+    if skipped:
+        print(f'Skipped {len(skipped)} unchanged base(s): {", ".join(skipped)}')
+    if failed:
+        print(f'Failed {len(failed)} base(s): {", ".join(failed)}')
+    if args.profile is not None:
+        profiler.report(profiler.take(), args.profile)
+    if args.watch:
+        # Load every table into memory; those just converted serially are already there
+        for base in bases:
+            if base not in failed:
+                warm_base(base)
+        watch_bases(state, date_str, args.formats, args.file, args.poll, args.debounce, stream, args.markup, args.schema)
+    elif failed:
+        sys.exit(1)
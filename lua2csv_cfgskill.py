@@ -1,227 +1,57 @@
-import re
 import csv
 import json
 import argparse
 import datetime
 import os
+import manifest
+import markup
+import profiler
+from output_sink import write_outputs, output_paths, DEFAULT_FORMATS
+from lua_decoder import iter_lua_fields, decode_lua_value, STRING_TRANSLATE
 
 def extract_skill_entries(lua_data):
     """
-    Extract individual skill entries from the Lua table using proper brace matching.
+    Extract individual skill entries from the Lua table in a single pass.
+
+    Entries and their values are located by offset with iter_lua_fields, so
+    nothing is re-scanned or copied beyond the value text itself. Strings are
+    unescaped and normalised with STRING_TRANSLATE as in the other
+    converters (line breaks dropped, full-width punctuation folded), tables
+    become JSON and other values are kept as their source text.
     """
     skills = []
-    
-    # Find all [id]={ patterns and extract complete entries with proper brace matching
-    i = 0
-    while i < len(lua_data):
-        # Look for [id]={
-        match = re.search(r'\[(\d+)\]\s*=\s*\{', lua_data[i:])
-        if not match:
-            break
-            
-        pos = i + match.start()
-        skill_id = match.group(1)
-        brace_pos = i + match.end() - 1  # Position of opening brace
-        
-        # Find matching closing brace
-        depth = 1
-        j = brace_pos + 1
-        in_string = False
-        escape = False
-        
-        while j < len(lua_data) and depth > 0:
-            c = lua_data[j]
-            
-            if escape:
-                escape = False
-                j += 1
-                continue
-                
-            if c == '\\':
-                escape = True
-                j += 1
-                continue
-                
-            if c == '"' and not in_string:
-                in_string = True
-            elif c == '"' and in_string:
-                in_string = False
-            elif not in_string:
-                if c == '{':
-                    depth += 1
-                elif c == '}':
-                    depth -= 1
-            
-            j += 1
-        
-        if depth == 0:
-            # Extract the complete skill entry content (between braces)
-            skill_content = lua_data[brace_pos+1:j-1]
-            
-            # Parse key-value pairs
-            skill_data = {'id': skill_id}
-            
-            # Use regex to find all key=value pairs
-            # Key can be: "key", [key], or just key
-            # Value can be: string, number, boolean, or table
-            
-            kv_pattern = r'(\[?"([a-zA-Z_][a-zA-Z0-9_]*)"?\]|"([a-zA-Z_][a-zA-Z0-9_]*)"|([a-zA-Z_][a-zA-Z0-9_]*))\s*=\s*'
-            
-            for kv_match in re.finditer(kv_pattern, skill_content):
-                # Determine which group captured the key
-                key = kv_match.group(2) or kv_match.group(3) or kv_match.group(4)
-                value_start = kv_match.end()
-                
-                # Extract value - find where it ends (comma at depth 0 or end of string)
-                depth = 0
-                in_string = False
-                escape = False
-                value_end = value_start
-                
-                for k in range(value_start, len(skill_content)):
-                    c = skill_content[k]
-                    
-                    if escape:
-                        escape = False
-                        continue
-                        
-                    if c == '\\':
-                        escape = True
-                        continue
-                        
-                    if c == '"' and not in_string:
-                        in_string = True
-                    elif c == '"' and in_string:
-                        in_string = False
-                    elif not in_string:
-                        if c in '{[':
-                            depth += 1
-                        elif c in '}]':
-                            depth -= 1
-                        elif c == ',' and depth == 0:
-                            value_end = k
-                            break
-                else:
-                    value_end = len(skill_content)
-                
-                value = skill_content[value_start:value_end].strip()
-                
-                # Parse the value
-                if value.startswith('"') and value.endswith('"'):
-                    # String value - unescape quotes
-                    value = value[1:-1].replace('\\"', '"')
-                elif value.lower() in ('true', 'false'):
-                    # Boolean value
-                    value = value.lower()
-                elif value.startswith('{'):
-                    # Table value - convert to JSON representation
-                    try:
-                        value = parse_lua_table(value)
-                    except:
-                        # If parsing fails, keep as string
-                        pass
-                
-                skill_data[key] = value
-            
-            skills.append(skill_data)
-            i = j
-        else:
-            i += 1
-    
-    return skills
 
+    start = lua_data.find('=')
+    if start == -1:
+        raise Exception('Could not find = in file')
 
-def parse_lua_table(table_str):
-    """
-    Simple Lua table parser for extracting structure as JSON.
-    Handles simple tables with {key=value, ...} structure.
-    """
-    table_str = table_str.strip()
-    if not table_str.startswith('{') or not table_str.endswith('}'):
-        return table_str
-    
-    # Remove outer braces
-    content = table_str[1:-1].strip()
-    
-    result = {}
-    
-    # Extract key-value pairs
-    i = 0
-    while i < len(content):
-        # Skip whitespace and commas
-        if content[i] in ' \t\n\r,':
-            i += 1
-            continue
-            
-        # Look for key
-        m = re.match(r'\[?([a-zA-Z_][a-zA-Z0-9_]*)\]?\s*=', content[i:])
-        if not m:
-            i += 1
+    for skill_id, entry_start, entry_end in iter_lua_fields(lua_data, start):
+        if lua_data[entry_start] != '{':
             continue
-            
-        key = m.group(1)
-        i += len(m.group(0))
-        
-        # Extract value
-        depth = 0
-        in_string = False
-        value_start = i
-        
-        while i < len(content):
-            c = content[i]
-            if c == '"' and (i == 0 or content[i-1] != '\\'):
-                in_string = not in_string
-            elif not in_string:
-                if c in '{[':
-                    depth += 1
-                elif c in '}]':
-                    depth -= 1
-                elif c == ',' and depth == 0:
-                    break
-            i += 1
-        
-        value = content[value_start:i].strip()
-        
-        # Try to parse value
-        if value.startswith('"') and value.endswith('"'):
-            value = value[1:-1]
-        elif re.match(r'^[0-9]', value):
-            try:
-                value = int(value) if '.' not in value else float(value)
-            except:
-                pass
-        elif value in ('true', 'false'):
-            value = value == 'true'
-        elif value.startswith('{'):
-            try:
-                value = parse_lua_table(value)
-            except:
-                pass
-        
-        result[key] = value
-    
-    return json.dumps(result, ensure_ascii=False)
 
+        skill_data = {'id': str(skill_id)}
+        for key, value_start, value_end in iter_lua_fields(lua_data, entry_start):
+            if not isinstance(key, str):
+                continue
+            c = lua_data[value_start]
+            if c == '{':
+                value, _ = decode_lua_value(lua_data, value_start, STRING_TRANSLATE)
+                value = json.dumps(value, ensure_ascii=False)
+            elif c in '"\'[':
+                value, _ = decode_lua_value(lua_data, value_start, STRING_TRANSLATE)
+            else:
+                value = lua_data[value_start:value_end]
+                if value == 'nil':
+                    continue
+            skill_data[key] = value
 
-def process_cfgskill_lua_to_csv(input_file, output_file, header_file):
-    """
-    Convert cfgskill.lua.txt to CSV format using regex-based parsing.
-    """
-    
-    # Read the header from the CSV file
-    with open(header_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        header = next(reader)
+        skills.append(skill_data)
 
-    # Read the Lua table from file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        lua_data = f.read()
+    return skills
 
-    # Extract skills using regex parsing
-    skills = extract_skill_entries(lua_data)
-    
-    print(f"Extracted {len(skills)} skills from Lua file")
 
+def skill_rows(skills, header):
+    """One row per skill with the header's columns formatted for CSV."""
     rows = []
     for skill in skills:
         row = []
@@ -232,7 +62,7 @@ def process_cfgskill_lua_to_csv(input_file, output_file, header_file):
             if isinstance(v, bool):
                 v = 'true' if v else 'false'
             elif isinstance(v, str):
-                v = v.replace('"', '""')
+                v = markup.render(v)
             elif isinstance(v, dict) or isinstance(v, list):
                 v = json.dumps(v, ensure_ascii=False)
             elif v is None:
@@ -243,30 +73,61 @@ def process_cfgskill_lua_to_csv(input_file, output_file, header_file):
             row.append(v)
         
         rows.append(row)
+    return rows
 
-    # Sort rows by id (first column) ascending
-    rows.sort(key=lambda x: int(x[0]) if isinstance(x[0], int) or (isinstance(x[0], str) and x[0].isdigit()) else 0)
+def process_cfgskill_lua_to_csv(input_file, output_file, header_file, formats=DEFAULT_FORMATS, collector=None):
+    """
+    Convert cfgskill.lua.txt to CSV, scanning its entries with extract_skill_entries.
+    A SchemaCollector given as collector observes every entry, and an empty
+    header is taken from it.
+    """
+    
+    # Read the header from the CSV file
+    header = []
+    if collector is None or os.path.exists(header_file):
+        with open(header_file, 'r', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+    if not header and collector is None:
+        raise Exception(f'{header_file} is empty; run lua2csv.py -schema -file cfgskill to infer it')
 
-    # Write CSV file
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(header)
-        writer.writerows(rows)
+    # Read the Lua table from file
+    size = os.path.getsize(input_file)
+    with profiler.stage('read', size):
+        with open(input_file, 'r', encoding='utf-8') as f:
+            lua_data = f.read()
+
+    # Extract skills in one pass over the file
+    with profiler.stage('decode', size):
+        skills = extract_skill_entries(lua_data)
+    
+    print(f"Extracted {len(skills)} skills from Lua file")
 
-    # Also output a tab-separated .txt file
-    txt_file = output_file.replace('.csv', '.txt')
-    with open(txt_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f, delimiter='\t')
-        writer.writerow(header)
-        writer.writerows(rows)
+    with profiler.stage('flatten'):
+        if collector is not None:
+            collector.observe_all(skills)
+            header = header or collector.header()
+        rows = skill_rows(skills, header)
 
-    print(f'Wrote {len(rows)} skill entries to {output_file} and {txt_file}.')
+    # Sort rows by id (first column) ascending
+    with profiler.stage('sort'):
+        rows.sort(key=lambda x: int(x[0]) if isinstance(x[0], int) or (isinstance(x[0], str) and x[0].isdigit()) else 0)
+
+    # Write the CSV/TSV outputs
+    count, paths = write_outputs(output_file, header, rows, formats)
+    print(f'Wrote {count} skill entries to {" and ".join(paths)}.')
+    return count
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Convert cfgskill.lua.txt to CSV format.')
     parser.add_argument('-date', action='store_true', help='Include date (YYYYMMDD) in output filename')
+    parser.add_argument('-profile', '--profile', nargs='?', const='', metavar='JSON', help='Time each stage (read, decode, flatten, sort, write) with its bytes and peak allocation, print a summary table, and write the records to JSON if a path is given')
+    parser.add_argument('-force', '--force', action='store_true', help='Convert even if the inputs are unchanged since the last run (see output/manifest.json)')
+    parser.add_argument('-markup', '--markup', choices=markup.MODES, default=markup.MODE, help='Rendering of <color> and <skillEff> tags in strings: color drops colour tags only (default), plain also turns <skillEff=X> into X, tags keeps strings as they are')
     args = parser.parse_args()
+    if args.profile is not None:
+        profiler.enable()
 
     # date suffix only when requested
     date_str = f'_{datetime.datetime.now().strftime("%Y%m%d")}' if args.date else ''
@@ -274,5 +135,18 @@ if __name__ == '__main__':
     input_file = os.path.join('lua', 'cfgskill.lua.txt')
     header_file = os.path.join('format', 'cfgskill.csv')
     output_file = os.path.join('output', f'cfgskill{date_str}.csv')
-    
-    process_cfgskill_lua_to_csv(input_file, output_file, header_file)
+    output_files = output_paths(output_file)
+
+    state = manifest.load_manifest()
+    fp = manifest.fingerprint(input_file, header_file)
+    if args.markup != 'color':
+        fp['markup'] = args.markup
+    if not args.force and manifest.is_up_to_date(state, 'cfgskill', fp, output_files):
+        print('Skipped unchanged base: cfgskill')
+    else:
+        with profiler.base('cfgskill'), markup.using(args.markup):
+            process_cfgskill_lua_to_csv(input_file, output_file, header_file)
+        manifest.record(state, 'cfgskill', fp, output_files)
+        manifest.save_manifest(state)
+    if args.profile is not None:
+        profiler.report(profiler.take(), args.profile)
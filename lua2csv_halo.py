@@ -1,25 +1,15 @@
-import re
-from slpp import slpp as lua
-import csv
+import argparse
+from explode import EXPLODE_CONFIGS, ChildTables, child_output_file
+from flatten import flatten_value, flat_sort_key
+import manifest
+import profiler
+from output_sink import write_outputs, output_paths, DEFAULT_FORMATS
+import table_cache
 
-def extract_halo_data(input_file, output_file):
-    with open(input_file, 'r', encoding='utf-8') as f:
-        lua_data = f.read()
-
-    start = lua_data.find('=')
-    start = lua_data.find('{', start)
-    end = lua_data.rfind('}')
-    lua_table = lua_data[start:end+1]
-
-    # Clean up
-    lua_table = re.sub(r'--.*', '', lua_table)
-    lua_table = re.sub(r'\n', '', lua_table)
-    lua_table = re.sub(r',([}\]])', r'\1', lua_table)
-    lua_table = re.sub(r'([\[{])([0-9]+)=', r'\1"\2":', lua_table)
-    lua_table = re.sub(r'([\[{])([a-zA-Z_][a-zA-Z0-9_]*)=', r'\1"\2":', lua_table)
-
-    table_data = lua.decode(lua_table)
+HALO_HEADER = ['id', 'effect1', 'percent1', 'effect2', 'percent2']
 
+def halo_rows(table_data):
+    """One row per halo: its id and up to two (effect, percent) pairs."""
     rows = []
     for entry in table_data.values():
         if isinstance(entry, dict) and 'id' in entry and 'percents' in entry:
@@ -34,20 +24,53 @@ def extract_halo_data(input_file, output_file):
                 flat.append('')
             row = [id_val] + flat[:4]
             rows.append(row)
+    return rows
 
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['id', 'effect1', 'percent1', 'effect2', 'percent2'])
-        writer.writerows(rows)
+def extract_halo_data(input_file, output_file, formats=DEFAULT_FORMATS, children=None, collector=None):
+    """
+    Write the halo table to output_file; children is its EXPLODE_CONFIGS
+    list, whose child tables come from the same decode and are formatted
+    and sorted by id like every other child table. A SchemaCollector given
+    as collector observes every entry.
+    """
+    table_data = table_cache.read_table(input_file)
+    with profiler.stage('flatten'):
+        if collector is not None:
+            collector.observe_all(table_data.values())
+        if children:
+            children = ChildTables(children, flatten_value, flat_sort_key)
+            children.observe_all(table_data.values())
+        rows = halo_rows(table_data)
 
-    # Also output a tab-separated .txt file
-    txt_file = output_file.replace('.csv', '.txt')
-    with open(txt_file, 'w', encoding='utf-8') as f:
-        f.write('\t'.join(['id', 'effect1', 'percent1', 'effect2', 'percent2']) + '\n')
-        for row in rows:
-            f.write('\t'.join(str(cell) for cell in row) + '\n')
-    
-    print(f'Wrote {len(rows)} skill entries to {output_file} and {txt_file}.')
+    count, paths = write_outputs(output_file, HALO_HEADER, rows, formats)
+    print(f'Wrote {count} skill entries to {" and ".join(paths)}.')
+    if children:
+        children.write(output_file, formats)
+    return count
 
 if __name__ == '__main__':
-    extract_halo_data('lua/cfgcfgHalo.lua.txt', 'output/cfgcfgHalo.csv')
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Convert cfgcfgHalo.lua.txt to CSV format.')
+    parser.add_argument('-profile', '--profile', nargs='?', const='', metavar='JSON', help='Time each stage (read, decode, flatten, sort, write) with its bytes and peak allocation, print a summary table, and write the records to JSON if a path is given')
+    parser.add_argument('-force', '--force', action='store_true', help='Convert even if the input is unchanged since the last run (see output/manifest.json)')
+    args = parser.parse_args()
+    if args.profile is not None:
+        profiler.enable()
+
+    input_file = 'lua/cfgcfgHalo.lua.txt'
+    output_file = 'output/cfgcfgHalo.csv'
+    children = EXPLODE_CONFIGS.get('cfgcfgHalo')
+    output_files = output_paths(output_file)
+    for table, _, _, _ in children or []:
+        output_files += output_paths(child_output_file(output_file, table))
+
+    state = manifest.load_manifest()
+    fp = manifest.fingerprint(input_file, explode=children)
+    if not args.force and manifest.is_up_to_date(state, 'cfgcfgHalo', fp, output_files):
+        print('Skipped unchanged base: cfgcfgHalo')
+    else:
+        with profiler.base('cfgcfgHalo'):
+            extract_halo_data(input_file, output_file, children=children)
+        manifest.record(state, 'cfgcfgHalo', fp, output_files)
+        manifest.save_manifest(state)
+    if args.profile is not None:
+        profiler.report(profiler.take(), args.profile)
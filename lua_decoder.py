@@ -0,0 +1,386 @@
+import re
+import string
+
+# Common full-width punctuation mapped to ASCII equivalents
+FW_MAP = {
+    '：': ':', '，': ',', '？': '?', '！': '!', '（': '(', '）': ')',
+    '［': '[', '］': ']', '｛': '{', '｝': '}', '“': '"', '”': '"',
+    '‘': "'", '’': "'", '…': '...', '—': '-', '–': '-', '、': ',',
+    '。': '.', '《': '"', '》': '"', '〈': '"', '〉': '"', '·': '.',
+    '「': '"', '」': '"', '『': '"', '』': '"', '【': '[', '】': ']',
+    '％': '%', '＃': '#', '＆': '&', '＊': '*', '／': '/', '＼': '\\',
+    '＂': '"', '＇': "'", '＄': '$', '＠': '@', '＾': '^', '＿': '_',
+    '＋': '+', '＝': '=', '｜': '|', '；': ';',
+    '　': ' ',  # full-width space
+}
+
+# Translate table the converters pass to the decoder for every string:
+# full-width punctuation to ASCII, newlines dropped and other non-printable
+# control characters blanked.
+STRING_TRANSLATE = str.maketrans({
+    **{chr(c): ' ' for c in range(128) if chr(c) not in string.printable},
+    '\n': '',
+    **FW_MAP,
+})
+
+
+# One token per match, with leading whitespace and comments skipped. The group
+# numbers are used directly by decode_lua_table, so keep them in sync.
+_TOKEN = re.compile(r'''
+    (\s*(?:--(?:\[(?P<cq>=*)\[.*?\](?P=cq)\]|[^\n]*)\s*)*)  # 1: skipped space/comments
+    (?:
+        \[\s*(-?\d+)\s*\]\s*=(?!=)                     # 3: [123]=
+      | \[\s*"([^"\\]*(?:\\.[^"\\]*)*)"\s*\]\s*=(?!=)  # 4: ["key"]=
+      | \[\s*'([^'\\]*(?:\\.[^'\\]*)*)'\s*\]\s*=(?!=)  # 5: ['key']=
+      | ([A-Za-z_]\w*)\s*=(?!=)                        # 6: key=
+      | "([^"\\\n]*(?:\\.[^"\\\n]*)*)"                 # 7: "string"
+      | '([^'\\\n]*(?:\\.[^'\\\n]*)*)'                 # 8: 'string'
+      | \[(?P<lq>=*)\[\n?(.*?)\](?P=lq)\]              # 10: [[long string]]
+      | (-?0[xX][0-9a-fA-F]+)                          # 11: hex number
+      | (-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)       # 12: number
+      | (true|false|nil)\b                             # 13: literal
+      | (\{)                                           # 14
+      | (\})                                           # 15
+      | ([,;])                                         # 16
+    )
+''', re.VERBOSE | re.DOTALL)
+
+# Only what can hide or change brace depth, for skipping over a table value
+_SKIP = re.compile(r'''
+    "[^"\\\n]*(?:\\.[^"\\\n]*)*"
+  | '[^'\\\n]*(?:\\.[^'\\\n]*)*'
+  | --\[(?P<cq>=*)\[.*?\](?P=cq)\]
+  | --[^\n]*
+  | \[(?P<lq>=*)\[.*?\](?P=lq)\]
+  | ([{}])
+''', re.VERBOSE | re.DOTALL)
+
+_ESCAPE = re.compile(r'\\(?:(\d{1,3})|x([0-9a-fA-F]{2})|z\s*|(.))', re.DOTALL)
+_ESCAPE_CHARS = {
+    'n': '\n', 't': '\t', 'r': '\r', 'a': '\a', 'b': '\b', 'f': '\f', 'v': '\v',
+    '\\': '\\', '"': '"', "'": "'", '\n': '\n',
+}
+_LITERALS = {'true': True, 'false': False, 'nil': None}
+# Characters stream_lua_table wants buffered past a token before trusting it
+_STREAM_MARGIN = 256
+
+
+def _unescape_match(m):
+    if m.group(1):
+        return chr(int(m.group(1)))
+    if m.group(2):
+        return chr(int(m.group(2), 16))
+    if m.group(3) is None:
+        return ''  # \z skips following whitespace
+    return _ESCAPE_CHARS.get(m.group(3), m.group(3))
+
+
+def unescape(s):
+    """Resolve Lua backslash escapes in a quoted string body."""
+    if '\\' not in s:
+        return s
+    return _ESCAPE.sub(_unescape_match, s)
+
+
+def _token_value(m, g, translate):
+    """Convert a scalar token matched by _TOKEN to its Python value."""
+    if g == 7 or g == 8:
+        val = unescape(m.group(g))
+        return val if translate is None else val.translate(translate)
+    if g == 12:
+        s = m.group(12)
+        if '.' in s or 'e' in s or 'E' in s:
+            return float(s)
+        return int(s)
+    if g == 10:
+        val = m.group(10)
+        return val if translate is None else val.translate(translate)
+    if g == 11:
+        return int(m.group(11), 16)
+    if g == 13:
+        return _LITERALS[m.group(13)]
+    raise Exception(f'Unexpected Lua syntax at offset {m.end(1)}')
+
+
+def decode_lua_table(text, pos=0, translate=None, columns=None, column_depth=2):
+    """
+    Decode the Lua table constructor starting at the first { at or after pos.
+
+    Tables holding only positional items become lists, tables with keys become
+    dicts (positional items keyed 1..n, in source order) and {} becomes an
+    empty dict. If translate is given it is applied to every string value
+    with str.translate, so callers can normalise text without touching the raw
+    dump.
+
+    If columns is given, tables column_depth levels down (by default the
+    entries of the top-level table) keep only those keys. Other values are
+    stepped over lexically and never become Python objects.
+
+    Returns (value, end) where end is the offset just past the closing }.
+    """
+    start = text.find('{', pos)
+    if start == -1:
+        raise Exception('Could not find table braces')
+
+    scan = _TOKEN.match
+    stack = []
+    # Current table: dict (or None while purely positional), list, positional count
+    d = None
+    arr = None
+    npos = 0
+    key = None
+    have_key = False
+    i = start
+
+    while True:
+        m = scan(text, i)
+        if m is None:
+            if not text[i:].strip():
+                raise Exception('Unexpected end of Lua table')
+            raise Exception(f'Unexpected Lua syntax at offset {i}')
+        i = m.end()
+        g = m.lastindex
+
+        if g == 14:
+            stack.append((d, arr, npos, key, have_key))
+            d = None
+            arr = []
+            npos = 0
+            have_key = False
+            continue
+        if g == 16:
+            continue
+        if g == 15:
+            if have_key:
+                raise Exception(f'Missing value for key {key!r} at offset {m.end(1)}')
+            if d is not None:
+                val = d
+            elif arr:
+                val = arr
+            else:
+                val = {}
+            d, arr, npos, key, have_key = stack.pop()
+            if not stack:
+                return val, i
+        elif 3 <= g <= 6:
+            if g == 3:
+                key = int(m.group(3))
+            elif g == 6:
+                key = m.group(6)
+            else:
+                key = unescape(m.group(g))
+            if columns is None or key in columns or len(stack) != column_depth:
+                have_key = True
+                continue
+            # Projected out: step over the value without decoding it
+            m = scan(text, i)
+            if m is None or not 7 <= m.lastindex <= 14:
+                raise Exception(f'Missing value for key {key!r} at offset {i}')
+            i = skip_lua_table(text, m.start(14)) if m.lastindex == 14 else m.end()
+            if d is None:
+                d = {j + 1: v for j, v in enumerate(arr)}
+            continue
+        else:
+            val = _token_value(m, g, translate)
+
+        # Store the finished value in the enclosing table
+        if have_key:
+            if d is None:
+                d = {j + 1: v for j, v in enumerate(arr)}
+            if val is not None:
+                d[key] = val
+            have_key = False
+        else:
+            npos += 1
+            if d is None:
+                arr.append(val)
+            else:
+                d[npos] = val
+
+
+def skip_lua_table(text, pos):
+    """
+    Return the offset just past the table whose { is at pos, without
+    decoding it. Strings, long brackets and comments are stepped over whole.
+    """
+    search = _SKIP.search
+    depth = 0
+    i = pos
+    while True:
+        m = search(text, i)
+        if m is None:
+            raise Exception(f'Unclosed table starting at offset {pos}')
+        i = m.end()
+        brace = m.group(3)
+        if brace == '{':
+            depth += 1
+        elif brace == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+
+
+def iter_lua_fields(text, pos=0):
+    """
+    Yield (key, start, end) for each field of the table whose { is the first
+    one at or after pos. Positional fields get keys 1..n. start/end are offsets
+    of the value's source text in text; nested tables are skipped, not decoded.
+    """
+    start = text.find('{', pos)
+    if start == -1:
+        raise Exception('Could not find table braces')
+
+    scan = _TOKEN.match
+    i = start + 1
+    npos = 0
+    key = None
+    while True:
+        m = scan(text, i)
+        if m is None:
+            raise Exception(f'Unexpected Lua syntax at offset {i}')
+        i = m.end()
+        g = m.lastindex
+        if g == 16:
+            continue
+        if g == 15:
+            return
+        if g == 3:
+            key = int(m.group(3))
+            continue
+        if g == 4 or g == 5:
+            key = unescape(m.group(g))
+            continue
+        if g == 6:
+            key = m.group(6)
+            continue
+        if g == 14:
+            i = skip_lua_table(text, m.start(14))
+        if key is None:
+            npos += 1
+            yield npos, m.end(1), i
+        else:
+            yield key, m.end(1), i
+            key = None
+
+
+def decode_lua_value(text, pos, translate=None, columns=None):
+    """
+    Decode the single Lua value (scalar or table) starting at pos. If it is a
+    table and columns is given, only those keys of it are decoded.
+
+    Returns (value, end) like decode_lua_table.
+    """
+    m = _TOKEN.match(text, pos)
+    if m is None:
+        raise Exception(f'Unexpected Lua syntax at offset {pos}')
+    g = m.lastindex
+    if g == 14:
+        return decode_lua_table(text, m.start(14), translate, columns, 1)
+    return _token_value(m, g, translate), m.end()
+
+
+def read_lua_table(input_file, translate=None, columns=None):
+    """
+    Read a _G["X"]={...} dump and decode the table after the first =,
+    keeping only columns in each entry if given.
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        lua_data = f.read()
+
+    start = lua_data.find('=')
+    if start == -1:
+        raise Exception('Could not find = in file')
+    table_data, _ = decode_lua_table(lua_data, start, translate, columns)
+    return table_data
+
+
+def _table_closes(text, pos):
+    try:
+        skip_lua_table(text, pos)
+        return True
+    except Exception:
+        return False
+
+
+def stream_lua_table(f, translate=None, columns=None, block_size=1 << 20):
+    """
+    Yield (key, value) for each top-level entry of the _G["X"]={...} dump
+    read from the text file f, decoding one entry at a time, so only about
+    one block plus the current entry is held in memory however large the
+    file is. Positional entries get keys 1..n and keyed nils are dropped,
+    as in decode_lua_table; a key that appears twice is yielded twice.
+    """
+    buf = ''
+    eof = False
+    i = 0
+
+    def refill():
+        # Drop what has been consumed; read at least as much as is buffered,
+        # so an entry larger than a block is rescanned only log(n) times
+        nonlocal buf, eof, i
+        block = f.read(max(block_size, len(buf) - i))
+        if not block:
+            eof = True
+        buf = buf[i:] + block
+        i = 0
+
+    # Find the { after the first =
+    while True:
+        eq = buf.find('=')
+        brace = buf.find('{', eq) if eq != -1 else -1
+        if brace != -1:
+            break
+        if eof:
+            raise Exception('Could not find = in file' if eq == -1 else 'Could not find table braces')
+        refill()
+    i = brace + 1
+
+    scan = _TOKEN.match
+    npos = 0
+    key = None
+    have_key = False
+    while True:
+        m = scan(buf, i)
+        # A token near the end of the buffer may be cut short (1e|3, 0|x1F)
+        if m is None or (not eof and len(buf) - m.end() < _STREAM_MARGIN):
+            if eof:
+                raise Exception('Unexpected end of Lua table' if not buf[i:].strip() else f'Unexpected Lua syntax near {buf[i:i + 40]!r}')
+            refill()
+            continue
+        g = m.lastindex
+        if g == 16:
+            i = m.end()
+            continue
+        if g == 15:
+            if have_key:
+                raise Exception(f'Missing value for key {key!r}')
+            return
+        if 3 <= g <= 6:
+            if g == 3:
+                key = int(m.group(3))
+            elif g == 6:
+                key = m.group(6)
+            else:
+                key = unescape(m.group(g))
+            have_key = True
+            i = m.end()
+            continue
+        if g == 14:
+            try:
+                val, end = decode_lua_table(buf, m.start(14), translate, columns, 1)
+            except Exception:
+                # Read on if the entry is only cut off by the end of the buffer
+                if eof or _table_closes(buf, m.start(14)):
+                    raise
+                refill()
+                continue
+        else:
+            val, end = _token_value(m, g, translate), m.end()
+        i = end
+        if have_key:
+            have_key = False
+            if val is not None:
+                yield key, val
+        else:
+            npos += 1
+            yield npos, val
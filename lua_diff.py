@@ -0,0 +1,138 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+from lua_decoder import iter_lua_fields, decode_lua_value
+from output_sink import write_outputs
+from flatten import flatten_value
+
+DIFF_HEADER = ['base', 'id', 'change', 'column', 'old', 'new']
+
+def lua_dir(version_dir):
+    """The folder holding a version's {base}.lua.txt dumps: version_dir/lua if present, else version_dir."""
+    sub = os.path.join(version_dir, 'lua')
+    return sub if os.path.isdir(sub) else version_dir
+
+def entry_hashes(input_file):
+    """
+    Hash the source text of every top-level entry of a dump without decoding
+    it. Returns (text, {id: (digest, start, end)}); a missing file counts as
+    an empty table.
+    """
+    try:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except FileNotFoundError:
+        return '', {}
+    start = text.find('=')
+    if start == -1:
+        raise Exception('Could not find = in file')
+    hashes = {}
+    for key, value_start, value_end in iter_lua_fields(text, start):
+        digest = hashlib.blake2b(text[value_start:value_end].encode('utf-8'), digest_size=16).digest()
+        hashes[key] = (digest, value_start, value_end)
+    return text, hashes
+
+def diff_entry(old, new):
+    """
+    [(column, old value, new value)] for the top-level fields that differ
+    between two decoded entries. Entries that are not tables are compared as a
+    whole under the column ''.
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return [] if old == new else [('', old, new)]
+    changes = []
+    for col in list(new) + [c for c in old if c not in new]:
+        if old.get(col) != new.get(col):
+            changes.append((col, old.get(col), new.get(col)))
+    return changes
+
+def diff_base(old_file, new_file):
+    """
+    Compare two versions of one dump by id.
+
+    Entries whose source text hashes the same are equal and never decoded;
+    only those that differ are decoded and compared field by field, so a
+    change in whitespace or key order alone is not reported. Returns
+    {'added': [id], 'removed': [id], 'changed': {id: [(column, old, new)]}}.
+    """
+    old_text, old_hashes = entry_hashes(old_file)
+    new_text, new_hashes = entry_hashes(new_file)
+    added = [k for k in new_hashes if k not in old_hashes]
+    removed = [k for k in old_hashes if k not in new_hashes]
+    changed = {}
+    for key, (digest, start, _) in new_hashes.items():
+        old = old_hashes.get(key)
+        if old is None or old[0] == digest:
+            continue
+        old_val, _ = decode_lua_value(old_text, old[1])
+        new_val, _ = decode_lua_value(new_text, start)
+        changes = diff_entry(old_val, new_val)
+        if changes:
+            changed[key] = changes
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+def diff_dirs(old_dir, new_dir, bases=None):
+    """diff_base for every base (default: all found in either version), as {base: diff}."""
+    old_lua, new_lua = lua_dir(old_dir), lua_dir(new_dir)
+    if not bases:
+        names = set()
+        for d in (old_lua, new_lua):
+            names.update(os.path.basename(p)[:-len('.lua.txt')] for p in glob.glob(os.path.join(d, '*.lua.txt')))
+        bases = sorted(names)
+    return {base: diff_base(os.path.join(old_lua, f'{base}.lua.txt'), os.path.join(new_lua, f'{base}.lua.txt'))
+            for base in bases}
+
+def diff_rows(diffs):
+    """One CSV row per added or removed id and per changed column."""
+    for base, d in diffs.items():
+        for key in d['added']:
+            yield [base, key, 'added', '', '', '']
+        for key in d['removed']:
+            yield [base, key, 'removed', '', '', '']
+        for key, changes in d['changed'].items():
+            for col, old, new in changes:
+                yield [base, key, 'changed', col, flatten_value(old), flatten_value(new)]
+
+def diff_json(diffs):
+    """The diffs as JSON-ready data; changed columns become {column: {'old': ..., 'new': ...}}."""
+    return {base: {
+        'added': d['added'],
+        'removed': d['removed'],
+        'changed': {str(key): {str(col): {'old': old, 'new': new} for col, old, new in changes}
+                    for key, changes in d['changed'].items()},
+    } for base, d in diffs.items()}
+
+def write_diff(path, diffs):
+    """Write diffs to path: .json as one JSON document, anything else as CSV."""
+    if path.endswith('.json'):
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(diff_json(diffs), f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+        return [path]
+    _, paths = write_outputs(path, DIFF_HEADER, diff_rows(diffs), ('csv',))
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='lua2csv.py diff', description='Compare two versions of the Lua dumps by id: added, removed and changed entries, with the exact changed columns.')
+    parser.add_argument('old_dir', help='Folder of the old version (its lua/ subfolder is used if present)')
+    parser.add_argument('new_dir', help='Folder of the new version')
+    parser.add_argument('-file', type=str, nargs='+', help='Only compare these bases (default: every {base}.lua.txt in either folder)')
+    parser.add_argument('-out', type=str, help='Write the changes to this file: .json for JSON, otherwise CSV (base,id,change,column,old,new)')
+    args = parser.parse_args(argv)
+
+    diffs = diff_dirs(args.old_dir, args.new_dir, args.file)
+    for base, d in diffs.items():
+        if d['added'] or d['removed'] or d['changed']:
+            print(f'{base}: {len(d["added"])} added, {len(d["removed"])} removed, {len(d["changed"])} changed')
+    unchanged = [base for base, d in diffs.items() if not (d['added'] or d['removed'] or d['changed'])]
+    if unchanged:
+        print(f'Unchanged: {", ".join(unchanged)}')
+    if args.out:
+        print(f'Wrote {" and ".join(write_diff(args.out, diffs))}.')
+    return 0
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import os
+
+# Library entry point for other programs:
+#
+#     import lua_tables
+#     for card in lua_tables.iter_entries('cfgCardData', ['id', 'name', 'skills']):
+#         print(card.id, card.name, card.skills)
+#
+# Importing this module only imports os; the decoder, the
+# table cache, csv and json are imported by the functions that need them,
+# so short-lived workers pay for them only when they read a table. Every
+# path is resolved against root (default ROOT, the folder of this file)
+# rather than the working directory.
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# namedtuple classes by field tuple; a dict rather than lru_cache so functools stays unimported
+_RECORD_TYPES = {}
+
+def _root(root):
+    return ROOT if root is None else root
+
+def lua_path(base, root=None):
+    """{root}/lua/{base}.lua.txt"""
+    return os.path.join(_root(root), 'lua', f'{base}.lua.txt')
+
+def output_path(base, root=None):
+    """{root}/output/{base}.csv, as written by lua2csv.py"""
+    return os.path.join(_root(root), 'output', f'{base}.csv')
+
+def cache_dir(root=None):
+    return os.path.join(_root(root), '.cache', 'tables')
+
+def load_table(base, columns=None, root=None, translate=None, cache=True):
+    """
+    The decoded table of a base: a dict for keyed tables, a list for purely
+    positional ones. columns keeps only those keys of each entry. With cache
+    (the default) the decoded table is stored under {root}/.cache/tables as
+    by the converters, so the next load is a marshal read.
+    """
+    columns = set(columns) if columns is not None else None
+    if not cache:
+        from lua_decoder import read_lua_table
+        return read_lua_table(lua_path(base, root), translate, columns)
+    import table_cache
+    return table_cache.read_table(lua_path(base, root), translate, columns, cache_dir(root))
+
+def load_columns(base, columns=None, root=None, translate=None):
+    """The table of a base as a column_store.ColumnTable, for holding many tables in memory at once."""
+    from column_store import ColumnTable
+    return ColumnTable(load_table(base, columns, root, translate))
+
+def record_type(fields):
+    """
+    A namedtuple class with fields (a tuple of entry keys), shared by every
+    call with the same fields. Keys that are not valid identifiers (or are
+    ints) get positional names _0, _1, ...
+    """
+    Entry = _RECORD_TYPES.get(fields)
+    if Entry is None:
+        from collections import namedtuple
+        Entry = _RECORD_TYPES[fields] = namedtuple('Entry', [str(f) for f in fields], rename=True)
+    return Entry
+
+def _items(table):
+    items = table.items() if isinstance(table, dict) else enumerate(table, 1)
+    return ((key, entry) for key, entry in items if isinstance(entry, dict))
+
+def iter_items(base, columns=None, root=None, translate=None, cache=True, stream=False):
+    """
+    (key, record) for each entry of a base, in dump order, as namedtuples
+    of columns (default every key any entry has, in first-seen order);
+    keys an entry lacks are None. With stream, entries are decoded one at a
+    time from the dump instead of loading the whole table; columns are
+    required then.
+    """
+    if stream:
+        if columns is None:
+            raise Exception('iter_entries(stream=True) needs columns')
+        from lua_decoder import stream_lua_table
+        Entry = record_type(tuple(columns))
+        keep = set(columns)
+        with open(lua_path(base, root), 'r', encoding='utf-8') as f:
+            for key, entry in stream_lua_table(f, translate, keep):
+                if isinstance(entry, dict):
+                    yield key, Entry._make([entry.get(c) for c in columns])
+        return
+    table = load_table(base, columns, root, translate, cache)
+    if columns is None:
+        columns = list(dict.fromkeys(k for _, entry in _items(table) for k in entry))
+    Entry = record_type(tuple(columns))
+    for key, entry in _items(table):
+        yield key, Entry._make([entry.get(c) for c in columns])
+
+def iter_entries(base, columns=None, root=None, translate=None, cache=True, stream=False):
+    """Records of each entry of a base, as iter_items without the keys."""
+    for _, record in iter_items(base, columns, root, translate, cache, stream):
+        yield record
+
+def get_entry(base, entry_id, root=None, translate=None):
+    """A single top-level entry as decoded (a dict), read through entry_index; None if absent."""
+    import entry_index
+    return entry_index.get_entry(base, entry_id, translate, os.path.join(_root(root), 'lua'))
+
+def entry_keys(base, root=None):
+    """The keys of every entry of a base in first-seen order, as extract_headers.py prints them."""
+    import extract_headers
+    root = _root(root)
+    return extract_headers.entry_keys(base, os.path.join(root, 'lua'), os.path.join(root, 'format'), cache_dir(root))
+
+def read_output(base, root=None):
+    """Records of the rows of a converted {root}/output/{base}.csv, all values as strings."""
+    import csv
+    with open(output_path(base, root), 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        Entry = record_type(tuple(header))
+        width = len(header)
+        for row in reader:
+            yield Entry._make(row[:width] + [None] * (width - len(row)))
+
+def read_schema(base, root=None):
+    """The schema lua2csv.py -schema saved for a base, or None."""
+    import schema
+    return schema.load_schema(base, os.path.join(_root(root), 'format'))
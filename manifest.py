@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = os.path.join('output', 'manifest.json')
+
+def file_hash(path):
+    """sha256 of a file's bytes, or None if it does not exist."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def fingerprint(input_file, header_file=None, config=None, explode=None):
+    """
+    Hashes of everything a base's output depends on: the Lua dump, its
+    format header (if any), its NESTED_CONFIGS entry (if any) and its
+    EXPLODE_CONFIGS child tables (if any).
+    """
+    fp = {'lua': file_hash(input_file)}
+    if header_file is not None:
+        fp['format'] = file_hash(header_file)
+    if config is not None:
+        fp['config'] = hashlib.sha256(json.dumps(config).encode('utf-8')).hexdigest()
+    if explode is not None:
+        fp['explode'] = hashlib.sha256(json.dumps(explode).encode('utf-8')).hexdigest()
+    return fp
+
+def load_manifest(path=MANIFEST_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def is_up_to_date(manifest, base, fp, output_files):
+    """True if base was last converted from the same inputs and its outputs still exist."""
+    entry = manifest.get(base)
+    if not entry or entry.get('inputs') != fp:
+        return False
+    if entry.get('outputs') != list(output_files):
+        return False
+    return all(os.path.exists(f) for f in output_files)
+
+def record(manifest, base, fp, output_files):
+    manifest[base] = {'inputs': fp, 'outputs': list(output_files)}
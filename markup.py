@@ -0,0 +1,97 @@
+import contextlib
+import functools
+import re
+
+# How converters render markup in strings (set with lua2csv.py -markup):
+#   'color' - drop <color=#...> and </color>, keep <skillEff=...> (the
+#             original output)
+#   'plain' - plain text: colour tags dropped, <skillEff=X> replaced by X
+#   'tags'  - strings left exactly as in the dump
+MODE = 'color'
+MODES = ('color', 'plain', 'tags')
+
+# Every tag in the dumps, in one alternation: colour start (group 1 the
+# colour), colour end, skill effect reference (group 2 the effect name),
+# and line breaks from multi-line [[...]] descriptions
+_TOKEN = re.compile(r'<color=(#[0-9A-Fa-f]{6})>|</color>|<skillEff=([^<>]*)>|\r?\n')
+_COLOR = re.compile(r'<color=#[0-9A-Fa-f]{6}>|</color>')
+
+def _plain_repl(m):
+    if m.group(2) is not None:
+        return m.group(2)
+    if m.group(1) is None and m.group(0) != '</color>':
+        return '\n'
+    return ''
+
+@functools.lru_cache(maxsize=1 << 16)
+def strip_color(s):
+    """s without <color=#...> and </color> tags."""
+    return _COLOR.sub('', s)
+
+@functools.lru_cache(maxsize=1 << 16)
+def plain_text(s):
+    """s as plain text: colour tags dropped, <skillEff=X> replaced by X, \\r\\n as \\n."""
+    return _TOKEN.sub(_plain_repl, s)
+
+def render(s, mode=None):
+    """s rendered in mode (default MODE); values that are not strings pass through."""
+    if not isinstance(s, str):
+        return s
+    mode = mode or MODE
+    if mode == 'color':
+        return strip_color(s)
+    if mode == 'plain':
+        return plain_text(s)
+    if mode == 'tags':
+        return s
+    raise Exception(f'Unknown markup mode {mode}')
+
+@contextlib.contextmanager
+def using(mode):
+    """Render in mode inside the with block (a converter run is passed its mode explicitly)."""
+    global MODE
+    if mode not in MODES:
+        raise Exception(f'Unknown markup mode {mode}')
+    saved, MODE = MODE, mode
+    try:
+        yield mode
+    finally:
+        MODE = saved
+
+@functools.lru_cache(maxsize=1 << 16)
+def _spans(s):
+    spans = []
+    colors = []
+    pos = 0
+
+    def text(t):
+        if t:
+            span = {'text': t}
+            if colors:
+                span['color'] = colors[-1]
+            spans.append(span)
+
+    for m in _TOKEN.finditer(s):
+        text(s[pos:m.start()])
+        pos = m.end()
+        if m.group(1) is not None:
+            colors.append(m.group(1))
+        elif m.group(2) is not None:
+            spans.append({'skill_eff': m.group(2)})
+        elif m.group(0) == '</color>':
+            if colors:
+                colors.pop()
+        else:
+            spans.append({'br': True})
+    text(s[pos:])
+    return tuple(spans)
+
+def spans(s):
+    """
+    s as a list of spans, in order:
+        {'text': ..., 'color': '#FFC432'}  text, with the colour around it if any
+        {'skill_eff': name}                a <skillEff=name> reference
+        {'br': True}                       a line break
+    Colour tags nest; an unclosed one runs to the end of s.
+    """
+    return [dict(span) for span in _spans(s)]
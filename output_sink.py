@@ -0,0 +1,135 @@
+import csv
+import itertools
+import json
+import os
+import profiler
+
+# Output format -> extension that replaces .csv in the output file name
+FORMAT_EXTENSIONS = {'csv': '.csv', 'tsv': '.txt', 'jsonl': '.jsonl'}
+DEFAULT_FORMATS = ('csv', 'tsv')
+
+BUFFER_SIZE = 1 << 20
+BATCH_ROWS = 4096
+
+def output_paths(output_file, formats=DEFAULT_FORMATS):
+    """Paths written for output_file (e.g. output/cfgCardData.csv) in each format."""
+    root, ext = os.path.splitext(output_file)
+    if ext != '.csv':
+        root = output_file
+    return [root + FORMAT_EXTENSIONS[fmt] for fmt in formats]
+
+class _JsonLinesWriter:
+    """csv.writer look-alike writing each row as a JSON object keyed by header."""
+
+    def __init__(self, f, header):
+        self.f = f
+        self.header = header
+
+    def writerows(self, rows):
+        header = self.header
+        self.f.write(''.join(json.dumps(dict(zip(header, row)), ensure_ascii=False) + '\n' for row in rows))
+
+class OutputSink:
+    """
+    Write one table to any set of formats in a single pass over its rows.
+
+    CSV and TSV go through csv.writer with the same quoting, JSON Lines through
+    json, so a value is escaped the same way whichever file it lands in. Rows
+    are handed to every writer in batches through large buffers, and each
+    file is written under a .tmp name and renamed into place only once all
+    formats are complete, so a crash never leaves a half-written output.
+
+        with OutputSink('output/cfgCardData.csv', header) as sink:
+            sink.write_rows(rows)
+    """
+
+    def __init__(self, output_file, header, formats=DEFAULT_FORMATS):
+        self.header = list(header)
+        self.formats = tuple(formats)
+        self.paths = output_paths(output_file, self.formats)
+        self.rows = 0
+        self._files = []
+        self._writers = []
+        try:
+            for fmt, path in zip(self.formats, self.paths):
+                f = open(path + '.tmp', 'w', encoding='utf-8', newline='', buffering=BUFFER_SIZE)
+                self._files.append(f)
+                if fmt == 'jsonl':
+                    self._writers.append(_JsonLinesWriter(f, self.header))
+                else:
+                    writer = csv.writer(f, delimiter='\t' if fmt == 'tsv' else ',')
+                    writer.writerow(self.header)
+                    self._writers.append(writer)
+        except BaseException:
+            self.abort()
+            raise
+
+    def write_rows(self, rows):
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, BATCH_ROWS))
+            if not batch:
+                break
+            for writer in self._writers:
+                writer.writerows(batch)
+            self.rows += len(batch)
+
+    def commit(self):
+        for f in self._files:
+            f.close()
+        for path in self.paths:
+            os.replace(path + '.tmp', path)
+        self._files = []
+
+    def abort(self):
+        for f in self._files:
+            f.close()
+            try:
+                os.remove(f.name)
+            except OSError:
+                pass
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+def write_outputs(output_file, header, rows, formats=DEFAULT_FORMATS, stage='write'):
+    """Write rows to every format at once, profiled as stage; returns (row count, paths written)."""
+    with profiler.stage(stage) as rec:
+        with OutputSink(output_file, header, formats) as sink:
+            sink.write_rows(rows)
+        rec['bytes'] = sum(os.path.getsize(p) for p in sink.paths)
+    return sink.rows, sink.paths
+
+def self_check():
+    """
+    Write values with quotes, separators and line breaks through
+    flatten_value to every format and read them back: json.loads and
+    csv.reader must all give the real strings.
+    """
+    import tempfile
+    from flatten import flatten_value
+    values = ['機神"ケラウノス"', {'k': 'a"b'}, ['x"y', {'k': 1}], 'a,b\tc\nd', 'plain']
+    real = ['機神"ケラウノス"', '{"k": "a\\"b"}', 'x"y;{"k": 1}', 'a,b\tc\nd', 'plain']
+    with tempfile.TemporaryDirectory() as tmp:
+        header = [f'c{i}' for i in range(len(values))]
+        _, paths = write_outputs(os.path.join(tmp, 't.csv'), header, [[flatten_value(v) for v in values]], tuple(FORMAT_EXTENSIONS))
+        for fmt, path in zip(FORMAT_EXTENSIONS, paths):
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                if fmt == 'jsonl':
+                    got = list(json.loads(f.readline()).values())
+                else:
+                    got = list(csv.reader(f, delimiter='\t' if fmt == 'tsv' else ','))[1]
+            if got != real:
+                raise Exception(f'{fmt} round trip failed: {got} != {real}')
+    print('CSV, TSV and JSON Lines round trips ok.')
+
+if __name__ == '__main__':
+    self_check()
@@ -0,0 +1,100 @@
+import contextlib
+import json
+import time
+import tracemalloc
+
+# Finished stages while profiling is enabled, as dicts:
+# {'base', 'stage', 'seconds', 'bytes', 'peak_alloc'}
+RECORDS = []
+# Called with each finished stage's record, even when profiling is not
+# enabled, so a pipeline can collect the same metrics in-process:
+#     profiler.HOOKS.append(lambda rec: metrics.observe(rec['stage'], rec['seconds']))
+HOOKS = []
+
+_enabled = False
+_bases = []
+
+def enable(memory=True):
+    """Start recording stages; memory=True also traces allocations (slower) for peak_alloc."""
+    global _enabled
+    _enabled = True
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    global _enabled
+    _enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def take():
+    """Return the records so far and start afresh."""
+    records = RECORDS[:]
+    RECORDS.clear()
+    return records
+
+@contextlib.contextmanager
+def base(name):
+    """Attribute the stages run inside to base name."""
+    _bases.append(name)
+    try:
+        yield
+    finally:
+        _bases.pop()
+
+@contextlib.contextmanager
+def stage(name, nbytes=None):
+    """
+    Time one stage of a conversion (read, decode, flatten, sort, write, ...).
+
+    Yields the stage's record, so bytes processed can be filled in once known
+    (rec['bytes'] = n). peak_alloc is the most memory allocated on top of what
+    was live when the stage began; it is None unless tracemalloc is tracing.
+    Stages are not meant to be nested.
+    """
+    if not _enabled and not HOOKS:
+        yield {}
+        return
+    rec = {'base': _bases[-1] if _bases else None, 'stage': name, 'seconds': None, 'bytes': nbytes, 'peak_alloc': None}
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        live, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    # A stage that raises is not recorded
+    yield rec
+    rec['seconds'] = time.perf_counter() - start
+    if tracing:
+        rec['peak_alloc'] = tracemalloc.get_traced_memory()[1] - live
+    if _enabled:
+        RECORDS.append(rec)
+    for hook in HOOKS:
+        hook(rec)
+
+def _mb(n):
+    return '' if n is None else f'{n / 1e6:.2f}'
+
+def summary(records):
+    """The records as a text table, one line per base and stage, with per-stage totals."""
+    # Wide enough for labelled stages such as write:changeCardIds
+    w = max([8] + [len(rec['stage']) for rec in records])
+    lines = [f'{"base":<28} {"stage":<{w}} {"seconds":>8} {"MB":>9} {"peak MB":>9}']
+    for rec in records:
+        lines.append(f'{rec["base"] or "":<28} {rec["stage"]:<{w}} {rec["seconds"]:8.3f} {_mb(rec["bytes"]):>9} {_mb(rec["peak_alloc"]):>9}')
+    totals = {}
+    for rec in records:
+        t = totals.setdefault(rec['stage'], [0.0, 0])
+        t[0] += rec['seconds']
+        t[1] += rec['bytes'] or 0
+    lines.append('')
+    for name, (seconds, nbytes) in totals.items():
+        lines.append(f'{"(all)":<28} {name:<{w}} {seconds:8.3f} {_mb(nbytes or None):>9}')
+    return '\n'.join(lines)
+
+def report(records, json_path=None):
+    """Print summary(records) and, if json_path is given, write them there as a JSON trace."""
+    print(summary(records))
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({'records': records}, f, indent=1)
+        print(f'Wrote profile to {json_path}.')
@@ -0,0 +1,123 @@
+import csv
+import json
+import os
+from collections.abc import Mapping
+from manifest import file_hash
+
+FORMAT_DIR = 'format'
+
+def value_type(val):
+    """Schema type name of a decoded Lua value."""
+    if isinstance(val, bool):
+        return 'bool'
+    if isinstance(val, int):
+        return 'int'
+    if isinstance(val, float):
+        return 'float'
+    if isinstance(val, str):
+        return 'str'
+    if isinstance(val, Mapping):
+        return 'map' if val else 'empty'
+    if isinstance(val, list):
+        return 'list'
+    return type(val).__name__
+
+class SchemaCollector:
+    """
+    Union of the keys of every entry it is shown, in first-seen order, with
+    the types each key's values take, how many entries have it, and for
+    list and map values the types of their items.
+
+        collector = SchemaCollector()
+        rows = flat_rows(collector.iter_observed(entries), header)
+    """
+
+    def __init__(self):
+        self.entries = 0
+        self.fields = {}
+
+    def observe(self, entry):
+        if not isinstance(entry, Mapping):
+            return
+        self.entries += 1
+        fields = self.fields
+        for key, val in entry.items():
+            field = fields.get(key)
+            if field is None:
+                field = fields[key] = {'types': set(), 'present': 0, 'items': set(), 'keys': set()}
+            field['present'] += 1
+            t = value_type(val)
+            field['types'].add(t)
+            if t == 'list':
+                field['items'].update(value_type(v) for v in val)
+            elif t == 'map':
+                field['keys'].update(value_type(k) for k in val)
+                field['items'].update(value_type(v) for v in val.values())
+
+    def observe_all(self, entries):
+        for entry in entries:
+            self.observe(entry)
+
+    def iter_observed(self, entries):
+        """Pass entries through unchanged, observing each on the way."""
+        for entry in entries:
+            self.observe(entry)
+            yield entry
+
+    def header(self):
+        return [str(key) for key in self.fields]
+
+    def schema(self):
+        fields = {}
+        for key, f in self.fields.items():
+            field = {'types': sorted(f['types']), 'present': f['present'], 'nullable': f['present'] < self.entries}
+            if f['items']:
+                field['items'] = sorted(f['items'])
+            if f['keys']:
+                field['keys'] = sorted(f['keys'])
+            fields[str(key)] = field
+        return {'entries': self.entries, 'fields': fields}
+
+def schema_path(base, format_dir=FORMAT_DIR):
+    return os.path.join(format_dir, f'{base}.schema.json')
+
+def load_schema(base, format_dir=FORMAT_DIR):
+    try:
+        with open(schema_path(base, format_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def save_schema(base, collector, input_file, write_header=True, format_dir=FORMAT_DIR):
+    """
+    Write format/{base}.schema.json from collector and, if write_header is
+    set, format/{base}.csv with the inferred header when that file is
+    missing or empty (a curated header is never overwritten). Prints a
+    warning for each field added or dropped since the previous schema.
+    Returns (added, dropped).
+    """
+    old = load_schema(base, format_dir)
+    new = collector.schema()
+    new['base'] = base
+    new['lua_sha256'] = file_hash(input_file)
+
+    added, dropped = [], []
+    if old is not None:
+        added = [k for k in new['fields'] if k not in old['fields']]
+        dropped = [k for k in old['fields'] if k not in new['fields']]
+        if added:
+            print(f'Warning: {base} has new field(s): {", ".join(added)}')
+        if dropped:
+            print(f'Warning: {base} no longer has field(s): {", ".join(dropped)}')
+
+    path = schema_path(base, format_dir)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(new, f, ensure_ascii=False, indent=1)
+    os.replace(path + '.tmp', path)
+
+    header_file = os.path.join(format_dir, f'{base}.csv')
+    if write_header and (not os.path.exists(header_file) or os.path.getsize(header_file) == 0):
+        with open(header_file, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f, lineterminator='').writerow(collector.header())
+        print(f'Wrote inferred header to {header_file}.')
+    return added, dropped
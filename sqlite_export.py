@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import table_cache
+from explode import EXPLODE_CONFIGS, ChildTables, child_columns
+from lua2csv import NESTED_CONFIGS, STRING_TRANSLATE, base_paths, clean_string, read_header, table_entries
+from lua2csv_halo import HALO_HEADER, halo_rows
+
+def sql_value(val):
+    """Scalars stay native (bools as 0/1, strings cleaned); tables become JSON text."""
+    if isinstance(val, bool):
+        return int(val)
+    if isinstance(val, str):
+        return clean_string(val)
+    if val is None or isinstance(val, (int, float)):
+        return val
+    return json.dumps(val, ensure_ascii=False)
+
+def _indexed(headers):
+    # The first column and every id column, as the joins go through them
+    return [headers[0]] + [h for h in headers[1:] if h.lower().endswith('id')]
+
+def flat_tables(base, entries, header):
+    """The base table with the header's columns; list columns stay JSON text."""
+    entries = [e for e in entries if isinstance(e, dict)]
+    key_col = 'id' if 'id' in header else header[0]
+    rows = [[sql_value(e.get(c)) for c in header] for e in entries]
+    return [(base, header, rows, [key_col])]
+
+def child_tables(base, entries):
+    """
+    The EXPLODE_CONFIGS child tables of base, built by the same ChildTables
+    the CSV outputs come from, so {base}_{table} has the same columns in the
+    database as output/{base}_{table}.csv.
+    """
+    children = ChildTables(EXPLODE_CONFIGS.get(base, []), sql_value)
+    children.observe_all(entries)
+    return [(f'{base}_{table}', header, rows, _indexed(header)) for table, header, rows in children.tables()]
+
+def nested_tables(base, entries):
+    """The NESTED_CONFIGS rows of base, with ids indexed."""
+    array_key, parent_fields, child_fields, headers = NESTED_CONFIGS[base]
+    rows = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        parent_vals = [sql_value(entry.get(f)) for f in parent_fields]
+        arr = entry.get(array_key, [])
+        if isinstance(arr, dict):
+            arr = list(arr.values())
+        for item in arr:
+            if isinstance(item, dict):
+                rows.append(parent_vals + [sql_value(item.get(f)) for f in child_fields])
+    return [(base, headers, rows, _indexed(headers))]
+
+def base_tables(base):
+    """(table, columns, rows, indexed columns) for every table a base exports to, child tables last."""
+    input_file, header_file, _ = base_paths(base)
+    children = child_columns(EXPLODE_CONFIGS.get(base, []))
+    if base == 'cfgcfgHalo':
+        table_data = table_cache.read_table(input_file)
+        tables = [(base, HALO_HEADER, halo_rows(table_data), ['id'])]
+    elif base in NESTED_CONFIGS:
+        array_key, parent_fields, _, _ = NESTED_CONFIGS[base]
+        table_data = table_cache.read_table(input_file, STRING_TRANSLATE, set(parent_fields) | {array_key} | children)
+        tables = nested_tables(base, table_entries(table_data))
+    else:
+        header = read_header(header_file)
+        table_data = table_cache.read_table(input_file, STRING_TRANSLATE, set(header) | children)
+        tables = flat_tables(base, table_entries(table_data), header)
+    return tables + child_tables(base, table_entries(table_data))
+
+def export_sqlite(db_path, bases):
+    """
+    Load every base into one SQLite database at db_path.
+
+    Each base is inserted in a single transaction and its indexes are built
+    after the bulk insert. The database is built under a .tmp name and moved
+    into place at the end. Returns {base: error message} for bases that could
+    not be loaded; the others are still exported.
+    """
+    tmp = db_path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+
+    errors = {}
+    try:
+        for base in bases:
+            try:
+                tables = base_tables(base)
+            except Exception as e:
+                errors[base] = f'{type(e).__name__}: {e}'
+                continue
+            with conn:
+                for name, columns, rows, indexed in tables:
+                    cols = ', '.join(f'"{c}"' for c in columns)
+                    conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+                    conn.execute(f'CREATE TABLE "{name}" ({cols})')
+                    conn.executemany(f'INSERT INTO "{name}" VALUES ({", ".join("?" * len(columns))})', rows)
+                    for col in indexed:
+                        conn.execute(f'CREATE INDEX "{name}_{col}_idx" ON "{name}" ("{col}")')
+            print(f'Loaded {base}: ' + ', '.join(f'{name} ({len(rows)} rows)' for name, _, rows, _ in tables))
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, db_path)
+    return errors
@@ -0,0 +1,172 @@
+import glob
+import hashlib
+import marshal
+import os
+import sys
+import time
+import profiler
+from lua_decoder import decode_lua_table, decode_lua_value, iter_lua_fields
+
+# Decoded tables are stored here as {base}-{dump hash}-{options hash}.marshal;
+# set to None to disable
+CACHE_DIR = os.path.join('.cache', 'tables')
+# Dump versions kept per base, each with every projection read from it; older
+# game versions are evicted past this
+CACHE_KEEP = 3
+# Bump when the decoder's output changes so stale entries are never reused
+CACHE_VERSION = 1
+# Set to {} to keep decoded entries in memory between reads (watch mode does);
+# a changed file then only has its changed entries decoded again. Entries are
+# kept as marshal bytes, so every read returns fresh objects
+MEMORY = None
+
+def _options_key(translate, columns):
+    h = hashlib.sha256()
+    h.update(f'{CACHE_VERSION}:{sys.version_info[:2]}:'.encode('utf-8'))
+    if translate is not None:
+        h.update(repr(sorted(translate.items())).encode('utf-8'))
+    if columns is not None:
+        h.update(repr(sorted(columns)).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+def _cache_name(base, data, translate, columns):
+    """The projections of one dump version share its {base}-{dump hash}- prefix, so eviction can group them."""
+    return f'{base}-{hashlib.sha256(data).hexdigest()[:32]}-{_options_key(translate, columns)}.marshal'
+
+def _base_name(input_file):
+    name = os.path.basename(input_file)
+    return name[:-len('.lua.txt')] if name.endswith('.lua.txt') else name
+
+def _decode_text(data):
+    # Same newline handling as reading the file in text mode
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+def _decode_bytes(data, translate, columns):
+    lua_data = _decode_text(data)
+    start = lua_data.find('=')
+    if start == -1:
+        raise Exception('Could not find = in file')
+    table_data, _ = decode_lua_table(lua_data, start, translate, columns)
+    return table_data
+
+def read_table(input_file, translate=None, columns=None, cache_dir=None):
+    """
+    read_lua_table with a persistent cache keyed by the file's content hash
+    (and the translate table and column projection). A hit is a marshal load
+    of the decoded table;
+    a miss decodes the file and stores the result, evicting old versions.
+    cache_dir, if given, is used instead of CACHE_DIR.
+    """
+    with profiler.stage('read') as rec:
+        with open(input_file, 'rb') as f:
+            data = f.read()
+        rec['bytes'] = len(data)
+    if MEMORY is not None:
+        return _read_warm(input_file, data, translate, columns)
+    return _read_cached(input_file, data, translate, columns, cache_dir)
+
+def _read_cached(input_file, data, translate, columns, cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    if cache_dir is None:
+        with profiler.stage('decode', len(data)):
+            return _decode_bytes(data, translate, columns)
+
+    base = _base_name(input_file)
+    path = os.path.join(cache_dir, _cache_name(base, data, translate, columns))
+    try:
+        with profiler.stage('cache', len(data)):
+            with open(path, 'rb') as f:
+                table_data = marshal.load(f)
+            os.utime(path)  # mark as recently used for eviction
+            return table_data
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    with profiler.stage('decode', len(data)):
+        table_data = _decode_bytes(data, translate, columns)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            marshal.dump(table_data, f)
+        os.replace(tmp, path)
+        evict(base, cache_dir=cache_dir)
+    return table_data
+
+def _read_warm(input_file, data, translate, columns):
+    """
+    read_table against MEMORY, which maps each (file, options) to
+    {entry source text: marshal bytes of the decoded entry} for the file's
+    last version. Entries whose text is unchanged are loaded from their
+    bytes; only new or edited ones are decoded. Either way the caller gets
+    its own objects, so changing a returned entry never leaks into the next
+    read. The first read of a file fills MEMORY from the disk cache.
+    """
+    text = _decode_text(data)
+    start = text.find('=')
+    if start == -1:
+        raise Exception('Could not find = in file')
+    fields = [(key, text[s:e], s) for key, s, e in iter_lua_fields(text, start)]
+    keys = [key for key, _, _ in fields]
+    slot = (input_file, _options_key(translate, columns))
+    memo = MEMORY.get(slot)
+
+    if memo is None or keys == list(range(1, len(keys) + 1)):
+        # First read, or a purely positional table (which decodes to a list)
+        table_data = _read_cached(input_file, data, translate, columns)
+        # Pair each entry's text with its value; only safe without duplicate keys or nils
+        if isinstance(table_data, dict) and len(set(keys)) == len(keys) == len(table_data):
+            MEMORY[slot] = {src: marshal.dumps(table_data[key]) for key, src, _ in fields}
+        return table_data
+
+    with profiler.stage('decode', len(data)):
+        table_data = {}
+        new_memo = {}
+        for key, src, s in fields:
+            blob = memo.get(src)
+            if blob is None:
+                val, _ = decode_lua_value(text, s, translate, columns)
+                blob = marshal.dumps(val)
+            else:
+                val = marshal.loads(blob)
+            new_memo[src] = blob
+            if val is not None:
+                table_data[key] = val
+        MEMORY[slot] = new_memo
+    return table_data
+
+def _entries(base=None, cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    if cache_dir is None:
+        return []
+    pattern = f'{glob.escape(base)}-*.marshal' if base else '*.marshal'
+    return glob.glob(os.path.join(cache_dir, pattern))
+
+def evict(base, keep=None, cache_dir=None):
+    """
+    Drop the entries of all but the keep (default CACHE_KEEP) most recently
+    used dump versions of base. Every projection of a kept version stays, so
+    tools reading different columns of the same dump never evict each other.
+    """
+    keep = CACHE_KEEP if keep is None else keep
+    versions = {}
+    for path in _entries(base, cache_dir):
+        dump_hash = os.path.basename(path)[len(base) + 1:].split('-')[0]
+        versions.setdefault(dump_hash, []).append(path)
+    used = sorted(versions.values(), key=lambda paths: max(map(os.path.getmtime, paths)), reverse=True)
+    removed = [path for paths in used[keep:] for path in paths]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def clear_cache(base=None, older_than_days=None):
+    """
+    Explicitly invalidate cached tables: every entry, those of one base, or
+    those not used within older_than_days. Returns the removed paths.
+    """
+    removed = []
+    cutoff = None if older_than_days is None else time.time() - older_than_days * 86400
+    for path in _entries(base):
+        if cutoff is None or os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed.append(path)
+    return removed
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import pytest
+import lua2csv
+import schema
+from dump_generator import FLAT_HEADER, write_dump
+
+# Synthetic bases, one per converter: a flat one with its header, a nested
+# one and the halo one with its child tables
+BASES = {'cfgSynthetic': 'flat', 'cfgCfgCardRoleAbilityPool': 'nested', 'cfgcfgHalo': 'halo'}
+# Not the default, so a worker that falls back to the default shows up
+MODE = 'tags'
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    """A working directory with lua/, format/ and output/ for BASES, converted with spawned workers."""
+    for folder in ('lua', 'format', 'output'):
+        (tmp_path / folder).mkdir()
+    for n, (base, kind) in enumerate(BASES.items()):
+        write_dump(str(tmp_path / 'lua' / f'{base}.lua.txt'), kind, 60000, seed=n)
+    (tmp_path / 'format' / 'cfgSynthetic.csv').write_text(','.join(FLAT_HEADER), encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(lua2csv, 'SPLIT_MIN_BYTES', 0)
+    method = multiprocessing.get_start_method(allow_none=True)
+    multiprocessing.set_start_method('spawn', force=True)
+    yield tmp_path
+    multiprocessing.set_start_method(method, force=True)
+
+def take_outputs(root):
+    """{name: bytes} of every output and schema file, emptying output/ for the next run."""
+    files = {}
+    for folder in ('output', 'format'):
+        for name in sorted(os.listdir(root / folder)):
+            path = root / folder / name
+            if folder == 'output' or name.endswith('.schema.json'):
+                files[name] = path.read_bytes()
+                if folder == 'output':
+                    path.unlink()
+    return files
+
+def convert_serially(split=1, stream=None, collect_schema=True):
+    for base in BASES:
+        collector = schema.SchemaCollector() if collect_schema else None
+        lua2csv.convert_base(base, '', split, ('csv', 'tsv', 'jsonl'), stream, MODE, collector)
+        if collector is not None:
+            lua2csv.save_base_schema(base, collector)
+
+def test_split_stream_and_jobs_match_serial(tree):
+    convert_serially()
+    serial = take_outputs(tree)
+    assert sorted(serial) == sorted(
+        [f'{base}{suffix}{ext}' for base in BASES for suffix in [''] + [f'_{t}' for t, _, _, _ in lua2csv.EXPLODE_CONFIGS.get(base, [])]
+         for ext in ('.csv', '.txt', '.jsonl')] + [f'{base}.schema.json' for base in BASES])
+    assert b'<color=' in serial['cfgSynthetic.csv']
+
+    # Collecting a schema turns -split off, so this run keeps the schemas above
+    convert_serially(split=3, collect_schema=False)
+    assert take_outputs(tree) == serial
+
+    convert_serially(stream=4096)
+    assert take_outputs(tree) == serial
+
+    results = lua2csv.run_jobs(list(BASES), '', 2, 1, ('csv', 'tsv', 'jsonl'), False, None, MODE, True)
+    for result in results:
+        assert result['error'] is None, result['error']
+        assert result['fingerprint'] == lua2csv.base_fingerprint(result['base'], MODE)
+        lua2csv.save_base_schema(result['base'], result['schema'])
+    assert [r['base'] for r in results] == list(BASES)
+    assert take_outputs(tree) == serial
+
+    results = lua2csv.run_jobs(list(BASES), '', 2, 1, ('csv', 'tsv', 'jsonl'), False, 4096, MODE, True)
+    for result in results:
+        lua2csv.save_base_schema(result['base'], result['schema'])
+    assert take_outputs(tree) == serial
@@ -0,0 +1,171 @@
+import io
+import os
+import random
+import pytest
+from dump_generator import ENTRY_MAKERS, make_dump
+from lua_decoder import (STRING_TRANSLATE, decode_lua_table, decode_lua_value, iter_lua_fields,
+                         read_lua_table, skip_lua_table, stream_lua_table, unescape)
+
+LUA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lua')
+
+def to_lua(val):
+    """Lua source for a decoded value, the inverse of decode_lua_table."""
+    if isinstance(val, bool):
+        return 'true' if val else 'false'
+    if isinstance(val, (int, float)):
+        return repr(val)
+    if isinstance(val, str):
+        return '"' + val.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+    if isinstance(val, list):
+        return '{' + ','.join(to_lua(v) for v in val) + '}'
+    items = []
+    for k, v in val.items():
+        items.append(f'[{k}]={to_lua(v)}' if isinstance(k, int) else f'[{to_lua(k)}]={to_lua(v)}')
+    return '{' + ',\n'.join(items) + '}'
+
+def random_value(rng, depth=0):
+    r = rng.random()
+    if depth > 2 or r < 0.5:
+        return rng.choice([
+            rng.randint(-10**6, 10**6),
+            rng.randint(0, 10**4) / 100,
+            rng.random() < 0.5,
+            ''.join(rng.choice('ab "\\\n{}[]=,;--攻撃：') for _ in range(rng.randint(0, 12))),
+        ])
+    if r < 0.75:
+        # Empty tables decode to {}, so lists are never empty
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(1, 4))]
+    keys = rng.sample(['id', 'name', 'desc', 'ids', 'x_1', 'キー', 3, 17, -2], rng.randint(1, 5))
+    return {k: random_value(rng, depth + 1) for k in keys}
+
+def dump_text(table):
+    return '_G["X"]=' + to_lua(table)
+
+def decode(text, translate=None, columns=None):
+    return decode_lua_table(text, text.find('='), translate, columns)[0]
+
+def stream(text, block_size, translate=None, columns=None):
+    return list(stream_lua_table(io.StringIO(text), translate, columns, block_size))
+
+def as_items(table):
+    return list(table.items()) if isinstance(table, dict) else list(enumerate(table, 1))
+
+@pytest.mark.parametrize('seed', range(20))
+def test_round_trip(seed):
+    rng = random.Random(seed)
+    table = {100 + n: random_value(rng) for n in range(20)}
+    assert decode(dump_text(table)) == table
+
+def test_scalars():
+    text = '_G["X"]={1, -2, 0x1F, -0x10, 1.5, .5, 1e3, 2E-2, true, false, "a", \'b\'}'
+    assert decode(text) == [1, -2, 31, -16, 1.5, 0.5, 1000.0, 0.02, True, False, 'a', 'b']
+
+def test_keys_and_nil():
+    text = '_G["X"]={[1]="a", ["b c"]=2, [\'d\']=3, e=4, f=nil, [-5]=6}'
+    assert decode(text) == {1: 'a', 'b c': 2, 'd': 3, 'e': 4, -5: 6}
+
+def test_mixed_tables_key_positions_from_one():
+    # Positional items take keys 1, 2, ... whatever keyed fields are around
+    # them; slpp numbered them from 0
+    assert decode('_G["X"]={"a", ["k"]=1, "b"}') == {1: 'a', 'k': 1, 2: 'b'}
+    assert decode('_G["X"]={"a", "b"}') == ['a', 'b']
+    assert decode('_G["X"]={}') == {}
+
+def test_halo_first_entry_is_key_one():
+    # The halo dump's first entry has no [id]=, so it is positional entry 1 (slpp: 0)
+    text = '_G["cfgHalo"]={{["id"]=1,["coordinate"]={{2,2},{1,1}}},\n[10230]={["id"]=10230,["nClass"]={0}}}'
+    table = decode(text)
+    assert list(table) == [1, 10230]
+    assert table[1] == {'id': 1, 'coordinate': [[2, 2], [1, 1]]}
+
+def test_halo_dump_keys():
+    path = os.path.join(LUA_DIR, 'cfgcfgHalo.lua.txt')
+    if not os.path.exists(path):
+        pytest.skip('no halo dump')
+    table = read_lua_table(path)
+    assert 0 not in table
+    assert table[1]['id'] == 1
+
+def test_long_string_drops_leading_newline():
+    # As in Lua, a newline right after [[ is not part of the string; slpp kept it
+    assert decode('_G["X"]={[[\nline1\nline2]]}') == ['line1\nline2']
+    assert decode('_G["X"]={[[line1\n]]}') == ['line1\n']
+    assert decode('_G["X"]={[==[a]]b]==]}') == ['a]]b']
+    assert decode('_G["X"]={[[\nx\n]]}', STRING_TRANSLATE) == ['x']
+
+def test_escapes():
+    assert unescape(r'a\nb\t\"\\\65\x41\z   c') == 'a\nb\t"\\AAc'
+    assert decode(r'_G["X"]={"a\"b", "\100", [[\n]]}') == ['a"b', 'd', '\\n']
+
+def test_comments_and_separators():
+    text = '_G["X"]={ -- first\n[1]=1; --[[ block\n}]] [2]=2, --[==[ x ]==]\n}'
+    assert decode(text) == {1: 1, 2: 2}
+
+def test_translate():
+    text = '_G["X"]={["d"]="攻撃：１０（A）\\n", ["l"]=[[a\nb]], ["t"]={"x："}}'
+    assert decode(text, STRING_TRANSLATE) == {'d': '攻撃:１０(A)', 'l': 'ab', 't': ['x:']}
+
+def test_columns_project_entries_only():
+    text = '_G["X"]={[1]={["id"]=1,["name"]="a",["arr"]={{["id"]=5,["num"]=2}},["skip"]={1,{2}}},[2]={["id"]=2}}'
+    assert decode(text, columns={'id', 'arr'}) == {1: {'id': 1, 'arr': [{'id': 5, 'num': 2}]}, 2: {'id': 2}}
+    # The top level and nested tables are never projected
+    assert decode(text, columns=set()) == {1: {}, 2: {}}
+
+def test_decode_lua_value_projects_the_value_itself():
+    text = '{["id"]=1,["name"]="a",["x"]={["id"]=2}}'
+    assert decode_lua_value(text, 0, columns={'id', 'x'}) == ({'id': 1, 'x': {'id': 2}}, len(text))
+    assert decode_lua_value(' "s" ', 0) == ('s', 4)
+
+def test_skip_and_iter_fields():
+    text = '_G["X"]={[1]={"}",[[}]],--}\n{}},["k"]="v",7}'
+    fields = list(iter_lua_fields(text, text.find('=')))
+    assert [k for k, _, _ in fields] == [1, 'k', 1]
+    start, end = fields[0][1], fields[0][2]
+    assert skip_lua_table(text, start) == end
+    assert text[start:end] == '{"}",[[}]],--}\n{}}'
+    assert decode_lua_value(text, start)[0] == ['}', '}', {}]
+
+@pytest.mark.parametrize('text', ['_G["X"]={1,', '_G["X"]={["a"]=}', '_G["X"]={@}', 'no table'])
+def test_errors(text):
+    with pytest.raises(Exception):
+        decode(text)
+
+# Tokens that break if a block boundary splits them
+TRICKY = ('_G["X"]={[5]={["n"]=1e3,["h"]=0x1F,["f"]=-12.5e-1,["s"]="a\\"}b",'
+          '["l"]=[==[x]]}]==],["c"]={--[[ } ]]\n1}},\n[6]={["id"]=6,["nil"]=nil},"pos",[10]=true}')
+
+@pytest.mark.parametrize('block_size', [1, 2, 3, 7, 64, 4096])
+def test_stream_matches_full_decode(block_size):
+    assert stream(TRICKY, block_size) == as_items(decode(TRICKY))
+    for kind in ENTRY_MAKERS:
+        text, _ = make_dump(kind, 20000, seed=block_size)
+        for translate, columns in [(None, None), (STRING_TRANSLATE, {'id', 'name', 'arr', 'ids'})]:
+            assert stream(text, block_size, translate, columns) == as_items(decode(text, translate, columns))
+
+@pytest.mark.parametrize('seed', range(5))
+def test_stream_round_trip(seed):
+    rng = random.Random(seed)
+    table = {100 + n: random_value(rng) for n in range(30)}
+    for block_size in (1, 16, 1 << 20):
+        assert dict(stream(dump_text(table), block_size)) == table
+
+def test_stream_dumps():
+    names = sorted(n for n in os.listdir(LUA_DIR) if n.endswith('.lua.txt')) if os.path.isdir(LUA_DIR) else []
+    if not names:
+        pytest.skip('no dumps in lua/')
+    for name in names:
+        path = os.path.join(LUA_DIR, name)
+        full = read_lua_table(path, STRING_TRANSLATE)
+        with open(path, 'r', encoding='utf-8') as f:
+            streamed = list(stream_lua_table(f, STRING_TRANSLATE, block_size=4096))
+        if isinstance(full, dict):
+            # A key that appears twice is streamed twice; the full decode keeps the last value
+            assert dict(streamed) == full
+        else:
+            assert [v for _, v in streamed] == full
+
+def test_stream_errors():
+    with pytest.raises(Exception):
+        stream('_G["X"]={{1,2}', 2)
+    with pytest.raises(Exception):
+        stream('no table here', 2)
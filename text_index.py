@@ -0,0 +1,254 @@
+import argparse
+import functools
+import marshal
+import os
+import re
+import time
+from array import array
+from lua_decoder import decode_lua_value, STRING_TRANSLATE
+from lua_diff import entry_hashes
+import markup
+
+LUA_DIR = 'lua'
+INDEX_FILE = os.path.join('.cache', 'text.idx')
+# Bump when the index layout or tokenising changes
+INDEX_VERSION = 1
+# Fields indexed per base
+TEXT_FIELDS = {
+    'cfgCfgSkillDesc': ['name', 'desc', 'desc1', 'desc4', 'desc5'],
+    'cfgCardData': ['name', 'm_Desc'],
+}
+# Tag terms are kept apart from the 1- and 2-character text grams
+EFF_PREFIX = 'eff:'
+
+@functools.lru_cache(maxsize=1 << 16)
+def normalise(s):
+    """Text as it is indexed and searched: markup dropped, full-width punctuation to ASCII, lower case."""
+    return markup.plain_text(s).translate(STRING_TRANSLATE).lower()
+
+def text_terms(s):
+    """Index terms of a string: its character 1- and 2-grams, and eff:X for each <skillEff=X>."""
+    text = normalise(s)
+    terms = {c for c in text if not c.isspace()}
+    terms.update(text[i:i + 2] for i in range(len(text) - 1) if not text[i:i + 2].isspace())
+    terms.update(EFF_PREFIX + span['skill_eff'] for span in markup.spans(s) if 'skill_eff' in span)
+    return terms
+
+def _postings(data):
+    a = array('I')
+    a.frombytes(data)
+    return a
+
+class TextIndex:
+    """
+    Inverted index from n-gram and tag terms to the texts that contain them.
+
+    Each distinct string is indexed once (descriptions repeat a lot) as a
+    text id; docs map (base, key, field) onto text ids. Postings are sorted
+    arrays of text ids, kept as bytes on disk and in memory. Entries are
+    tracked by a hash of their source text, so update() only decodes and
+    re-indexes the entries that changed.
+    """
+
+    def __init__(self, state=None):
+        if state is None or state.get('version') != INDEX_VERSION:
+            state = {'version': INDEX_VERSION, 'files': {}, 'entries': {}, 'docs': [], 'texts': [], 'refs': [], 'postings': {}}
+        self.state = state
+        self.text_ids = {t: i for i, t in enumerate(state['texts']) if t is not None}
+        self._text_docs = None
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        try:
+            with open(path, 'rb') as f:
+                return cls(marshal.load(f))
+        except (OSError, EOFError, ValueError, TypeError):
+            return cls()
+
+    def save(self, path=INDEX_FILE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            marshal.dump(self.state, f)
+        os.replace(tmp, path)
+
+    def update(self, lua_dir=LUA_DIR, fields=TEXT_FIELDS):
+        """
+        Bring the index up to date with the dumps; returns {base: entries
+        re-indexed or dropped} for the bases whose dump was re-read or
+        removed. Unchanged files are skipped by size and mtime, and in a
+        changed file only entries whose source text differs are decoded.
+        """
+        state = self.state
+        added, removed = {}, {}
+        counts = {}
+        for base in list(state['entries']):
+            if base not in fields:
+                self._drop_entries(base, list(state['entries'][base]), removed)
+                del state['entries'][base]
+                state['files'].pop(base, None)
+        for base, base_fields in fields.items():
+            input_file = os.path.join(lua_dir, f'{base}.lua.txt')
+            if not os.path.exists(input_file):
+                # A removed dump takes its entries out of the index
+                if base in state['entries']:
+                    counts[base] = len(state['entries'][base])
+                    self._drop_entries(base, list(state['entries'][base]), removed)
+                    del state['entries'][base]
+                    state['files'].pop(base, None)
+                continue
+            st = os.stat(input_file)
+            stat_key = (st.st_size, st.st_mtime_ns, list(base_fields))
+            if state['files'].get(base) == stat_key:
+                continue
+            text, hashes = entry_hashes(input_file)
+            entries = state['entries'].setdefault(base, {})
+            stale = [key for key in entries if key not in hashes or entries[key][0] != hashes[key][0]]
+            self._drop_entries(base, stale, removed)
+            columns = set(base_fields)
+            count = 0
+            for key, (digest, start, _) in hashes.items():
+                if key in entries:
+                    continue
+                entry, _ = decode_lua_value(text, start, None, columns)
+                doc_ids = []
+                if isinstance(entry, dict):
+                    for field in base_fields:
+                        val = entry.get(field)
+                        if isinstance(val, str) and val:
+                            doc_ids.append(self._add_doc(base, key, field, val, added))
+                entries[key] = (digest, doc_ids)
+                count += 1
+            state['files'][base] = stat_key
+            counts[base] = count + len([k for k in stale if k not in hashes])
+
+        postings = state['postings']
+        for term in set(added) | set(removed):
+            ids = _postings(postings.get(term, b''))
+            gone = removed.get(term)
+            if gone:
+                ids = array('I', (i for i in ids if i not in gone))
+            # New text ids are larger than any existing one, so appending keeps the order
+            ids.extend(added.get(term, ()))
+            if ids:
+                postings[term] = ids.tobytes()
+            else:
+                postings.pop(term, None)
+        self._text_docs = None
+        return counts
+
+    def _add_doc(self, base, key, field, val, added):
+        state = self.state
+        tid = self.text_ids.get(val)
+        if tid is None:
+            tid = self.text_ids[val] = len(state['texts'])
+            state['texts'].append(val)
+            state['refs'].append(0)
+            for term in text_terms(val):
+                added.setdefault(term, []).append(tid)
+        state['refs'][tid] += 1
+        state['docs'].append((base, key, field, tid))
+        return len(state['docs']) - 1
+
+    def _drop_entries(self, base, keys, removed):
+        state = self.state
+        entries = state['entries'][base]
+        for key in keys:
+            for doc_id in entries.pop(key)[1]:
+                tid = state['docs'][doc_id][3]
+                state['docs'][doc_id] = None
+                state['refs'][tid] -= 1
+                if state['refs'][tid] == 0:
+                    for term in text_terms(state['texts'][tid]):
+                        removed.setdefault(term, set()).add(tid)
+                    del self.text_ids[state['texts'][tid]]
+                    state['texts'][tid] = None
+
+    def garbage(self):
+        """Share of doc slots left empty by removed entries."""
+        docs = self.state['docs']
+        return docs.count(None) / len(docs) if docs else 0
+
+    def _matching_texts(self, term):
+        """Text ids containing term: a quoted phrase or word, or eff:X for a tag."""
+        postings = self.state['postings']
+        if term.startswith(EFF_PREFIX):
+            return set(_postings(postings.get(term, b'')))
+        term = normalise(term)
+        grams = [term] if len(term) == 1 else {term[i:i + 2] for i in range(len(term) - 1) if not term[i:i + 2].isspace()}
+        lists = sorted((postings.get(g, b'') for g in grams), key=len)
+        if not lists:
+            return set()
+        tids = set(_postings(lists[0]))
+        for data in lists[1:]:
+            if not tids:
+                break
+            tids.intersection_update(_postings(data))
+        # Grams only narrow it down; the text must contain the term itself
+        texts = self.state['texts']
+        return {t for t in tids if term in normalise(texts[t])}
+
+    def search(self, query, bases=None):
+        """
+        Docs matching every term of query, as [(base, key, field, text)].
+        Terms are separated by spaces; "quoted text" is one term, spaces
+        included, and eff:X matches <skillEff=X> tags.
+        """
+        terms = [a if a else b for a, b in re.findall(r'"([^"]*)"|(\S+)', query)]
+        terms = [t for t in terms if t.strip()]
+        if not terms:
+            return []
+        tids = None
+        for term in sorted(terms, key=lambda t: not t.startswith(EFF_PREFIX)):
+            found = self._matching_texts(term)
+            tids = found if tids is None else tids & found
+            if not tids:
+                return []
+        if self._text_docs is None:
+            self._text_docs = {}
+            for doc in self.state['docs']:
+                if doc is not None:
+                    self._text_docs.setdefault(doc[3], []).append(doc)
+        texts = self.state['texts']
+        results = [(base, key, field, texts[tid]) for tid in tids for base, key, field, tid in self._text_docs.get(tid, [])
+                   if bases is None or base in bases]
+        results.sort(key=lambda r: (r[0], str(r[1]), r[2]))
+        return results
+
+def load_updated(path=INDEX_FILE, lua_dir=LUA_DIR):
+    """The index at path, updated for any changed dumps (and saved if anything changed)."""
+    index = TextIndex.load(path)
+    # Bases whose dump was re-read; saving records their new size and mtime
+    # even if no entry changed
+    counts = index.update(lua_dir)
+    if counts:
+        if index.garbage() > 0.5:
+            # Mostly removed docs: start afresh rather than carry the gaps
+            index = TextIndex()
+            index.update(lua_dir)
+        index.save(path)
+    return index
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Search skill and card text. Terms are ANDed; "quote" a phrase; eff:裂傷 matches <skillEff=裂傷>.')
+    parser.add_argument('query', nargs='*', help='Search terms, e.g. 裂傷 "2ターン" eff:気絶')
+    parser.add_argument('-file', type=str, nargs='+', help='Only show results from these bases')
+    parser.add_argument('-build', action='store_true', help='Rebuild the index from scratch')
+    parser.add_argument('-limit', type=int, default=20, help='Results printed (default 20)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.build:
+        index = TextIndex()
+        counts = index.update()
+        index.save()
+        print(f'Indexed {sum(counts.values())} entries ({len(index.text_ids)} distinct texts, {len(index.state["postings"])} terms) in {time.perf_counter() - started:.2f}s.')
+    else:
+        index = load_updated()
+    if args.query:
+        started = time.perf_counter()
+        results = index.search(' '.join(args.query), args.file)
+        elapsed = time.perf_counter() - started
+        for base, key, field, text in results[:args.limit]:
+            print(f'{base} {key} {field}: {markup.plain_text(text)}')
+        print(f'{len(results)} result(s) in {elapsed * 1000:.1f} ms.')
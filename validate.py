@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import sys
+import time
+import table_cache
+from explode import iter_path
+from output_sink import write_outputs
+
+# Foreign keys between the bases: (base, path, target base, target key).
+# path is walked from each entry as in EXPLODE_CONFIGS, '*' stepping into
+# every item, and every value it reaches must be the target key of some
+# entry of the target base.
+FOREIGN_KEYS = [
+    ('cfgCardData',              ['skills', '*'],             'cfgCfgSkillDesc',           'id'),
+    ('cfgCardData',              ['jcSkills', '*'],           'cfgCfgSkillDesc',           'id'),
+    ('cfgCardData',              ['tfSkills', '*'],           'cfgCfgSkillDesc',           'id'),
+    ('cfgCardData',              ['tcSkills', '*'],           'cfgCfgSkillDesc',           'id'),
+    ('cfgCardData',              ['subTfSkills', '*'],        'cfgCfgSubTalentSkillPool',  'id'),
+    ('cfgCardData',              ['halo', '*'],               'cfgcfgHalo',                'id'),
+    ('cfgCardData',              ['role_id'],                 'cfgCfgCardRole',            'id'),
+    ('cfgCardData',              ['pos_enum', '*'],           'cfgCfgRolePosEnum',         'id'),
+    ('cfgCardData',              ['changeCardIds', '*', '*'], 'cfgCardData',               'id'),
+    ('cfgCfgSubTalentSkillPool', ['ids', '*', 'id'],          'cfgCfgSubTalentSkill',      'id'),
+    ('cfgCfgSubTalentSkill',     ['next_id'],                 'cfgCfgSubTalentSkill',      'id'),
+    ('cfgCfgSubTalentSkill',     ['nFightSkillId'],           'cfgskill',                  'id'),
+    ('cfgCfgSubTalentSkill',     ['range_key'],               'cfgskill_range',            'key'),
+    ('cfgCfgCardRole',           ['nAbilityId', '*'],         'cfgCfgCardRoleAbilityPool', 'id'),
+]
+VALIDATE_HEADER = ['base', 'id', 'field', 'value', 'target']
+
+def field_label(path, positions):
+    """['ids', '*', 'id'] at position (2,) -> 'ids[2].id'"""
+    label = ''
+    positions = iter(positions)
+    for step in path:
+        label += f'[{next(positions)}]' if step == '*' else (f'.{step}' if label else str(step))
+    return label
+
+def load_tables(rules, lua_dir='lua'):
+    """
+    Decode each base the rules mention once, keeping only the keys they use.
+    Returns {base: [(id, entry)]}; bases without a dump are left out.
+    """
+    columns = {}
+    for base, path, target, key in rules:
+        columns.setdefault(base, set()).update(('id', path[0]))
+        columns.setdefault(target, set()).add(key)
+    tables = {}
+    for base, cols in columns.items():
+        input_file = os.path.join(lua_dir, f'{base}.lua.txt')
+        if not os.path.exists(input_file):
+            continue
+        table = table_cache.read_table(input_file, None, cols)
+        items = table.items() if isinstance(table, dict) else enumerate(table, 1)
+        tables[base] = [(entry.get('id', key), entry) for key, entry in items if isinstance(entry, dict)]
+    return tables
+
+def check(rules, tables):
+    """
+    Check every rule against tables. Returns ({rule index: [(id, field,
+    value)]} of dangling references, [indexes of rules skipped because a
+    dump is missing]). Each target key is indexed once as a set, and each
+    rule's references are checked with one set difference.
+    """
+    indexes = {}
+    dangling = {}
+    skipped = []
+    for i, (base, path, target, key) in enumerate(rules):
+        if base not in tables or target not in tables:
+            skipped.append(i)
+            continue
+        index = indexes.get((target, key))
+        if index is None:
+            index = indexes[(target, key)] = {entry[key] for _, entry in tables[target] if key in entry}
+        refs = [(entry_id, positions, value) for entry_id, entry in tables[base]
+                for positions, value in iter_path(entry, path)]
+        missing = {value for _, _, value in refs if value is not None} - index
+        if missing:
+            dangling[i] = [(entry_id, field_label(path, positions), value)
+                           for entry_id, positions, value in refs if value in missing]
+    return dangling, skipped
+
+def rule_name(rule):
+    base, path, target, key = rule
+    return f'{base}.{field_label(path, [""] * path.count("*"))} -> {target}.{key}'
+
+def validate_rows(rules, dangling):
+    for i, refs in dangling.items():
+        base, _, target, key = rules[i]
+        for entry_id, field, value in refs:
+            yield [base, entry_id, field, value, f'{target}.{key}']
+
+def write_report(path, rules, dangling):
+    """Write the dangling references to path: .json as one JSON document, anything else as CSV."""
+    if path.endswith('.json'):
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({rule_name(rules[i]): [{'id': entry_id, 'field': field, 'value': value} for entry_id, field, value in refs]
+                       for i, refs in dangling.items()}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+        return [path]
+    _, paths = write_outputs(path, VALIDATE_HEADER, validate_rows(rules, dangling), ('csv',))
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='lua2csv.py validate', description='Check the references between the Lua dumps (FOREIGN_KEYS in validate.py) and list dangling ids. Exits with 1 if there are any.')
+    parser.add_argument('-file', type=str, nargs='+', help='Only check rules whose source base is one of these')
+    parser.add_argument('-lua', type=str, default='lua', help='Folder of the {base}.lua.txt dumps (default lua)')
+    parser.add_argument('-show', type=int, default=5, help='Dangling references printed per rule (default 5)')
+    parser.add_argument('-out', type=str, help='Write every dangling reference to this file: .json for JSON, otherwise CSV (base,id,field,value,target)')
+    parser.add_argument('-no-cache', action='store_true', help='Decode every dump from scratch instead of using the decoded-table cache')
+    args = parser.parse_args(argv)
+    if args.no_cache:
+        table_cache.CACHE_DIR = None
+
+    started = time.perf_counter()
+    rules = [rule for rule in FOREIGN_KEYS if not args.file or rule[0] in args.file]
+    tables = load_tables(rules, args.lua)
+    dangling, skipped = check(rules, tables)
+    for i, rule in enumerate(rules):
+        if i in skipped:
+            print(f'{rule_name(rule)}: skipped, no {os.path.join(args.lua, (rule[0] if rule[0] not in tables else rule[2]) + ".lua.txt")}')
+        elif i in dangling:
+            refs = dangling[i]
+            print(f'{rule_name(rule)}: {len(refs)} dangling ({len({v for _, _, v in refs})} distinct ids)')
+            for entry_id, field, value in refs[:args.show]:
+                print(f'  {rule[0]} {entry_id} {field} = {value}')
+        else:
+            print(f'{rule_name(rule)}: ok')
+    if args.out:
+        print(f'Wrote {" and ".join(write_report(args.out, rules, dangling))}.')
+    total = sum(len(refs) for refs in dangling.values())
+    print(f'{total} dangling reference(s) in {len(dangling)} of {len(rules) - len(skipped)} rule(s), checked in {time.perf_counter() - started:.2f}s.')
+    return 1 if dangling else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
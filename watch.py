@@ -0,0 +1,119 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct('iIII')
+
+class InotifyWatcher:
+    """Report changed files in dirs through Linux inotify."""
+
+    def __init__(self, dirs):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}
+        for d in dirs:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(d), _WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {d}')
+            self.dirs[wd] = d
+
+    def wait(self, timeout=None):
+        """Paths changed since the last call, waiting up to timeout seconds (None: forever) for the first."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        paths = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return paths
+            pos = 0
+            while pos < len(buf):
+                wd, mask, _, length = _EVENT.unpack_from(buf, pos)
+                pos += _EVENT.size
+                name = buf[pos:pos + length].rstrip(b'\0')
+                pos += length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost: treat every watched file as changed
+                    paths.update(os.path.join(d, n) for d in self.dirs.values() for n in os.listdir(d))
+                elif wd in self.dirs and name:
+                    paths.add(os.path.join(self.dirs[wd], os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Report changed files in dirs by comparing (size, mtime) every interval seconds."""
+
+    def __init__(self, dirs, interval=1.0):
+        self.dirs = list(dirs)
+        self.interval = interval
+        self.state = self._scan()
+
+    def _scan(self):
+        state = {}
+        for d in self.dirs:
+            for name in os.listdir(d):
+                path = os.path.join(d, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                state[path] = (st.st_size, st.st_mtime_ns)
+        return state
+
+    def wait(self, timeout=None):
+        """Paths changed since the last call, waiting up to timeout seconds (None: forever) for the first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self._scan()
+            paths = {p for p in state.keys() | self.state.keys() if state.get(p) != self.state.get(p)}
+            self.state = state
+            if paths:
+                return paths
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            delay = self.interval if deadline is None else min(self.interval, max(0, deadline - time.monotonic()))
+            time.sleep(delay)
+
+    def close(self):
+        pass
+
+def make_watcher(dirs, poll=False, interval=1.0):
+    """An InotifyWatcher on Linux, else (or if poll is set or inotify fails) a PollingWatcher."""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(dirs)
+        except OSError as e:
+            print(f'inotify unavailable ({e}), polling every {interval}s instead.')
+    return PollingWatcher(dirs, interval)
+
+def wait_for_changes(watcher, debounce=0.5):
+    """
+    Block until files change, then keep collecting until debounce seconds
+    pass without further changes, so a burst of writes (a file being copied
+    in, or several dumps dropped at once) is handled as one batch.
+    """
+    paths = watcher.wait()
+    while True:
+        more = watcher.wait(debounce)
+        if not more:
+            return paths
+        paths |= more